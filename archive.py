@@ -0,0 +1,498 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import aiohttp
+import asyncio
+import os
+import time
+from archive_jobs import ArchiveJobStore
+from attachment_stream import MemoryBudget, SpooledAttachment, format_size
+from guild_stats import GuildCounters
+from metrics import request_labels
+
+MAX_EMBEDS_PER_MESSAGE = 10   # Discordの上限
+MAX_FILES_PER_MESSAGE = 10    # Discordの上限
+MAX_EMBED_CHARS = 6000        # 1メッセージ内の埋め込み合計文字数の上限
+PREFETCH_MESSAGES = 20        # 先読みしておくメッセージ数
+DOWNLOAD_CONCURRENCY = 4      # 添付ファイルの同時ダウンロード数
+PROGRESS_INTERVAL = 5         # 進捗表示を更新する間隔（秒）
+MIRROR_SCAN_LIMIT = 20        # 再開時に保存先の末尾から確認するメッセージ数
+MAX_MESSAGE_ATTEMPTS = 3      # 同じメッセージの送信・添付のダウンロードがこの回数失敗したら飛ばす（再開をまたいで数える）
+# 1ジョブが添付ファイルをメモリに保持してよい上限。超える分は一時ファイルに逃がす
+ARCHIVE_MEMORY_LIMIT = int(os.getenv("ARCHIVE_MEMORY_LIMIT_MB", "64")) * 1048576
+
+
+class ArchiveProgress:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.messages = 0
+        self.attachments = 0
+        self.sent = 0
+        self.failed = 0
+        self.linked = 0
+        self.skipped = 0
+        self.peak_memory = 0
+        self._last_report = 0
+        self._last_checkpoint = self.started
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        return f"📦 コピー中… {self.messages}件のメッセージ / 添付{self.attachments}件（送信{self.sent}回、経過{int(elapsed)}秒）"
+
+
+class ArchiveCog(commands.Cog):
+    def __init__(self, bot, memory_limit: int = ARCHIVE_MEMORY_LIMIT):
+        self.bot = bot
+        self.memory_limit = memory_limit
+        self._download_semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+        self._session = None
+        self.jobs = ArchiveJobStore()
+        self._running = set()
+        # 起動時に再開したジョブのタスク（参照を持っておかないと途中で回収されることがある）
+        self._resumed_tasks = set()
+        self._resumed_on_start = False
+        self.counters = GuildCounters()
+
+    async def cog_unload(self):
+        # 止めたジョブは status が running のまま残り、次の起動で続きから再開される
+        tasks = list(self._resumed_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    @app_commands.command(name="archive_ch_th", description="チャンネルの内容をフォーラム投稿にコピーします")
+    @app_commands.describe(
+        保存元="保存元のチャンネル",
+        保存先="保存先のフォーラム投稿（スレッド）"
+    )
+    async def archive_ch_th(self, interaction: discord.Interaction, 保存元: discord.TextChannel, 保存先: discord.Thread):
+        await self._archive_messages(interaction, 保存元, 保存先)
+
+    @app_commands.command(name="archive_th_th", description="フォーラム投稿の内容を別のフォーラム投稿にコピーします")
+    @app_commands.describe(
+        保存元="保存元のフォーラム投稿（スレッド）",
+        保存先="保存先のフォーラム投稿（スレッド）"
+    )
+    async def archive_th_th(self, interaction: discord.Interaction, 保存元: discord.Thread, 保存先: discord.Thread):
+        await self._archive_messages(interaction, 保存元, 保存先)
+
+    async def _archive_messages(self, interaction: discord.Interaction, 保存元: discord.abc.Messageable, 保存先: discord.Thread):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        # 同じ保存元→保存先のジョブがあれば、前回の続きから再開する（重複コピーしない）
+        job_id = self.jobs.find(保存元.id, 保存先.id)
+        if job_id is None:
+            job_id = self.jobs.create(interaction.guild_id, 保存元.id, 保存先.id, interaction.user.id)
+        await self._start_job(interaction, job_id, 保存元, 保存先)
+
+    async def _start_job(self, interaction, job_id, 保存元, 保存先):
+        if job_id in self._running:
+            await interaction.followup.send(f"⏳ ジョブ#{job_id} は実行中です。`/archive_status` で進捗を確認できます。", ephemeral=True)
+            return
+
+        progress = await self._run_job(job_id, 保存元, 保存先, interaction)
+
+        if progress.messages == 0 and progress.failed == 0:
+            await interaction.followup.send(f"保存元にコピーするメッセージがありません。（ジョブ#{job_id}）", ephemeral=True)
+            return
+        if progress.failed:
+            await interaction.followup.send(f"⚠️ ジョブ#{job_id} は途中で失敗しました（{progress.messages}件コピー済み）。`/archive_resume` で続きから再開できます。", ephemeral=True)
+            return
+        linked_part = f"\nサイズ超過の添付{progress.linked}件はリンクで保存しました。" if progress.linked else ""
+        skipped_part = f"\n何度やっても送れなかったメッセージ{progress.skipped}件は飛ばしました（`/archive_status` に記録）。" if progress.skipped else ""
+        await interaction.followup.send(
+            f"保存元: {保存元.mention} のメッセージをスレッド: {保存先.mention} に保存しました！（ジョブ#{job_id}）\n"
+            f"添付のメモリ使用量（最大）: {format_size(progress.peak_memory)}{linked_part}{skipped_part}",
+            ephemeral=True
+        )
+
+    async def _run_job(self, job_id, 保存元, 保存先, interaction=None):
+        """
+        保存元の履歴をチェックポイントの次から古い順に読みながら、添付ファイルを先読みし、
+        複数メッセージ分の埋め込み・ファイルを1回の送信にまとめて保存先へ流し込む。
+        送信に成功するたびにチェックポイントを保存し、失敗したらそこで止める。
+        同じメッセージが MAX_MESSAGE_ATTEMPTS 回失敗した場合は、記録して飛ばす。
+        """
+        self._running.add(job_id)
+        self.jobs.set_status(job_id, "running")
+        progress = ArchiveProgress()
+        budget = MemoryBudget(self.memory_limit)
+        producer = None
+        queue = None
+        cancelled = False
+        try:
+            after = self.jobs.jobs[job_id]["last_message_id"]
+            mirrored = await self._last_mirrored_id(保存元, 保存先)
+            if mirrored and (after is None or mirrored > after):
+                after = mirrored  # チェックポイント保存前に落ちた分は保存先から判断する
+
+            queue = asyncio.Queue(maxsize=PREFETCH_MESSAGES)
+            producer = asyncio.create_task(self._read_history(保存元, queue, after, budget, 保存先.guild.filesize_limit))
+            await self._write_batches(interaction, queue, 保存先, progress, job_id)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            print(f"アーカイブジョブ#{job_id} でエラーが発生しました: {e}")
+            progress.failed += 1
+        finally:
+            if producer is not None:
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+            if queue is not None:
+                self._discard_prefetched(queue)
+            self._running.discard(job_id)
+            progress.peak_memory = budget.peak
+            self.jobs.record_peak_memory(job_id, budget.peak)
+            if not cancelled:
+                self.jobs.set_status(job_id, "failed" if progress.failed else "done")
+        return progress
+
+    async def _last_mirrored_id(self, 保存元, 保存先):
+        # 保存先の埋め込みの作者リンク（元メッセージのURL）から、この保存元のコピー済みの最新IDを得る
+        latest = None
+        async for message in 保存先.history(limit=MIRROR_SCAN_LIMIT):
+            if message.author != self.bot.user:
+                continue
+            for embed in message.embeds:
+                url = embed.author.url if embed.author else None
+                if not url:
+                    continue
+                parts = url.rstrip("/").rsplit("/", 2)
+                if len(parts) != 3 or parts[1] != str(保存元.id) or not parts[2].isdigit():
+                    continue
+                message_id = int(parts[2])
+                latest = max(latest or 0, message_id)
+        return latest
+
+    async def _read_history(self, 保存元, queue, after, budget, size_limit):
+        # 履歴は100件ずつページングされる。添付のダウンロードは読みながら並行して始める
+        after = discord.Object(id=after) if after else None
+        try:
+            async for message in 保存元.history(limit=None, after=after, oldest_first=True):
+                if not message.content and not message.attachments:
+                    continue
+                # 1回で送れるサイズを超える分はダウンロードせずリンクにする
+                transfer, oversize, total = [], [], 0
+                for attachment in message.attachments:
+                    if total + attachment.size <= size_limit:
+                        transfer.append(attachment)
+                        total += attachment.size
+                    else:
+                        oversize.append(attachment)
+                files_task = asyncio.create_task(self._download_attachments(transfer, budget)) if transfer else None
+                try:
+                    await queue.put((message, files_task, oversize))
+                except asyncio.CancelledError:
+                    if files_task is not None:
+                        self._discard_files(files_task)
+                    raise
+        except Exception as e:
+            # 途中で読めなくなった場合はジョブを失敗扱いにして、チェックポイントから再開できるようにする
+            await queue.put(e)
+            return
+        await queue.put(None)
+
+    async def _download_attachments(self, attachments, budget):
+        # メモリ予算内ならメモリ、超える分は一時ファイルへチャンク単位で書き出す
+        session = self._get_session()
+        spools = [SpooledAttachment(a, budget) for a in attachments]
+
+        async def download(spool):
+            async with self._download_semaphore:
+                return await spool.download(session)
+        try:
+            return await asyncio.gather(*(download(spool) for spool in spools))
+        except BaseException:
+            # 失敗・キャンセルのどちらでも、受け取り途中の中身を手放す
+            for spool in spools:
+                spool.close()
+            raise
+
+    def _discard_files(self, files_task):
+        # 先読みしたが送らなかった添付。ダウンロード中なら止め、済んでいれば中身を手放す
+        if not files_task.done():
+            files_task.cancel()
+        elif not files_task.cancelled() and files_task.exception() is None:
+            for spool in files_task.result():
+                spool.close()
+
+    def _discard_prefetched(self, queue):
+        while not queue.empty():
+            item = queue.get_nowait()
+            if isinstance(item, tuple) and item[1] is not None:
+                self._discard_files(item[1])
+
+    def build_embed(self, message, oversize=()):
+        embed = discord.Embed(description=message.content or "", timestamp=message.created_at)
+        # 作者名のリンク先を元メッセージにしておき、再開時のコピー済み判定に使う
+        embed.set_author(name=message.author.display_name, url=message.jump_url, icon_url=message.author.display_avatar.url)
+        if oversize:
+            links = "\n".join(f"[{a.filename}]({a.url}) ({format_size(a.size)})" for a in oversize)
+            embed.add_field(name="添付ファイル（サイズ超過のためリンク）", value=links[:1024], inline=False)
+        return embed
+
+    async def _write_batches(self, interaction, queue, 保存先, progress, job_id):
+        size_limit = 保存先.guild.filesize_limit
+        # items: [(保存元メッセージ, 埋め込み, 添付のspool)]
+        items, chars, size = [], 0, 0
+        message_files = []
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                message, files_task, oversize = item
+                message_files = []
+                if files_task is not None:
+                    try:
+                        message_files = await files_task
+                    except Exception as e:
+                        if not self._message_failed(job_id, message, f"添付のダウンロード: {e}", progress,
+                                                    skip_reason="添付をダウンロードできないためリンクで保存"):
+                            raise
+                        # 何度やってもダウンロードできない添付は、サイズ超過と同じくリンクで残す
+                        oversize = list(message.attachments)
+                embed = self.build_embed(message, oversize)
+                embed_chars = len(embed)
+                message_size = sum(spool.attachment.size for spool in message_files)
+                progress.linked += len(oversize)
+
+                # 上限を超えるなら、ここまでの分を先に送る
+                if items and (
+                    len(items) >= MAX_EMBEDS_PER_MESSAGE
+                    or sum(len(spools) for _, _, spools in items) + len(message_files) > MAX_FILES_PER_MESSAGE
+                    or chars + embed_chars > MAX_EMBED_CHARS
+                    or size + message_size > size_limit
+                ):
+                    batch, items, chars, size = items, [], 0, 0
+                    if not await self._send_batch(保存先, batch, progress, job_id):
+                        return
+
+                items.append((message, embed, message_files))
+                message_files = []
+                chars += embed_chars
+                size += message_size
+                await self._report_progress(interaction, progress)
+
+            if items:
+                batch, items = items, []
+                await self._send_batch(保存先, batch, progress, job_id)
+        finally:
+            # 途中で止まった場合、まだ送っていない分の添付を手放す
+            for _, _, spools in items + [(None, None, message_files)]:
+                for spool in spools:
+                    spool.close()
+
+    async def _send_batch(self, 保存先, items, progress, job_id):
+        """
+        まとめて送れなかった場合は1件ずつ送り直し、送れなかったメッセージで止める
+        （MAX_MESSAGE_ATTEMPTS 回目の失敗なら飛ばして続ける）。
+        """
+        # 固定のsleepは入れない。レート制限（X-RateLimit-* ヘッダー / 429）は
+        # discord.py のHTTPクライアントがルートのバケットごとに待機・再送してくれる
+        try:
+            try:
+                await self._send(保存先, items)
+            except discord.HTTPException as e:
+                if len(items) == 1:
+                    return self._message_failed(job_id, items[0][0], e, progress)
+                print(f"まとめて送れなかったため1件ずつ送り直します: {e}")
+            else:
+                self._record_sent(job_id, items, progress)
+                return True
+
+            for item in items:
+                try:
+                    await self._send(保存先, [item])
+                except discord.HTTPException as e:
+                    if not self._message_failed(job_id, item[0], e, progress):
+                        return False
+                    continue
+                self._record_sent(job_id, [item], progress)
+            return True
+        finally:
+            for _, _, spools in items:
+                for spool in spools:
+                    spool.close()
+
+    async def _send(self, 保存先, items):
+        with request_labels(cog="archive", guild=保存先.guild.id):
+            await 保存先.send(
+                embeds=[embed for _, embed, _ in items],
+                files=[spool.to_file() for _, _, spools in items for spool in spools],
+            )
+
+    def _record_sent(self, job_id, items, progress):
+        size = sum(spool.attachment.size for _, _, spools in items for spool in spools)
+        progress.sent += 1
+        progress.messages += len(items)
+        progress.attachments += sum(len(spools) for _, _, spools in items)
+        now = time.monotonic()
+        self.jobs.checkpoint(job_id, items[-1][0].id, len(items), size, now - progress._last_checkpoint)
+        progress._last_checkpoint = now
+
+    def _message_failed(self, job_id, message, error, progress, skip_reason=None):
+        """
+        失敗を記録する。続けてよい（MAX_MESSAGE_ATTEMPTS 回目で飛ばした）場合は True。
+        """
+        attempts = self.jobs.record_failure(job_id, message.id, error)
+        if attempts < MAX_MESSAGE_ATTEMPTS:
+            print(f"メッセージ送信中にエラーが発生しました（{attempts}/{MAX_MESSAGE_ATTEMPTS}回目）: {error}")
+            progress.failed += 1
+            return False
+        reason = skip_reason or f"送信できないため飛ばしました: {error}"
+        print(f"⚠️ アーカイブジョブ#{job_id}: メッセージ {message.id} が{MAX_MESSAGE_ATTEMPTS}回失敗しました（{reason}）")
+        self.jobs.record_skip(job_id, message.id, reason)
+        if skip_reason is None:
+            # 送らずに先へ進む（添付をリンクにする場合は、このあと埋め込みと一緒に送ってチェックポイントを進める）
+            now = time.monotonic()
+            self.jobs.checkpoint(job_id, message.id, 0, 0, now - progress._last_checkpoint)
+            progress._last_checkpoint = now
+            progress.skipped += 1
+        return True
+
+    async def _report_progress(self, interaction, progress):
+        if interaction is None:
+            return
+        now = time.monotonic()
+        if now - progress._last_report < PROGRESS_INTERVAL:
+            return
+        progress._last_report = now
+        try:
+            await interaction.edit_original_response(content=progress.summary())
+        except discord.HTTPException:
+            pass  # インタラクションの期限切れ等は進捗表示だけ諦める
+
+    @app_commands.command(name="archive_resume", description="中断したアーカイブを続きから再開します")
+    @app_commands.describe(ジョブ番号="/archive_status で表示されるジョブ番号")
+    async def archive_resume(self, interaction: discord.Interaction, ジョブ番号: int):
+        job = self.jobs.for_guild(interaction.guild_id).get(ジョブ番号)
+        if job is None:
+            await interaction.response.send_message("⚠️ 無効なジョブ番号です。", ephemeral=True)
+            return
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        try:
+            保存元, 保存先 = await self._resolve_job_channels(job)
+        except discord.HTTPException as e:
+            await interaction.followup.send(f"❌ チャンネルを取得できませんでした: {e}", ephemeral=True)
+            return
+        await self._start_job(interaction, ジョブ番号, 保存元, 保存先)
+
+    @app_commands.command(name="archive_status", description="アーカイブジョブの状況を表示します")
+    async def archive_status(self, interaction: discord.Interaction):
+        jobs = self.jobs.for_guild(interaction.guild_id)
+        if not jobs:
+            await interaction.response.send_message("🔕 アーカイブジョブはありません。", ephemeral=True)
+            return
+
+        status_label = {"running": "実行中", "done": "完了", "failed": "中断"}
+        lines = []
+        for job_id in sorted(jobs, reverse=True)[:10]:
+            job = jobs[job_id]
+            status = status_label.get(job["status"], job["status"])
+            if job["status"] == "running" and job_id not in self._running:
+                status = "中断（再起動待ち）"
+            elapsed = job["elapsed"] or 0
+            rate = job["messages"] / elapsed if elapsed else 0
+            mb = job["bytes"] / 1048576
+            mb_rate = mb / elapsed if elapsed else 0
+            lines.append(
+                f"#{job_id} <#{job['source_id']}> → <#{job['dest_id']}> [{status}] "
+                f"{job['messages']}件 / {mb:.1f}MB | {rate:.1f}件/秒, {mb_rate:.2f}MB/秒 | "
+                f"最大メモリ {format_size(job.get('peak_memory', 0))}"
+                + (f" | 飛ばした{len(job['skipped'])}件" if job.get("skipped") else "")
+            )
+        await interaction.response.send_message("📋 アーカイブジョブ：\n" + "\n".join(lines), ephemeral=True)
+
+    async def _resolve_job_channels(self, job):
+        channels = []
+        for channel_id in (job["source_id"], job["dest_id"]):
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+            channels.append(channel)
+        return channels
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # 再起動前に実行中だったジョブをチェックポイントから再開する
+        if self._resumed_on_start:
+            return
+        self._resumed_on_start = True
+        for job_id in self.jobs.unfinished():
+            try:
+                保存元, 保存先 = await self._resolve_job_channels(self.jobs.jobs[job_id])
+            except discord.HTTPException as e:
+                print(f"アーカイブジョブ#{job_id} を再開できませんでした: {e}")
+                self.jobs.set_status(job_id, "failed")
+                continue
+            print(f"アーカイブジョブ#{job_id} を再開します")
+            task = asyncio.create_task(self._run_job(job_id, 保存元, 保存先))
+            self._resumed_tasks.add(task)
+            task.add_done_callback(self._resumed_tasks.discard)
+
+    @app_commands.command(name="server", description="サーバーの情報を表示します")
+    async def server_info(self, interaction: discord.Interaction):
+        guild = interaction.guild
+        if not guild:
+            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
+            return
+
+        counts = self.counters.get(guild.id)
+        if counts is None:
+            self.counters.seed(guild)
+            counts = self.counters.get(guild.id)
+        self.counters.count_bots(guild)
+        approx = "" if counts.bots_exact else "（集計中）"
+
+        embed = discord.Embed(title="📊 サーバー情報", color=0x00AE86)
+        embed.add_field(name="メンバー数", value=f"{counts.humans}人+{counts.bots}Bot{approx}", inline=True)
+        embed.add_field(name="ロール数", value=f"{counts.roles}/250個", inline=True)
+        embed.add_field(name="チャンネル数", value=f"{counts.channels}/500個", inline=True)
+        embed.timestamp = discord.utils.utcnow()
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        self.counters.seed(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.counters.seed(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.counters.drop(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.counters.member_joined(member.guild.id, member.bot)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload):
+        # キャッシュに無いメンバーの退出も拾えるよう raw イベントを使う
+        self.counters.member_left(payload.guild_id, payload.user.bot)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.counters.add(role.guild.id, "roles", 1)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.counters.add(role.guild.id, "roles", -1)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.counters.add(channel.guild.id, "channels", 1)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.counters.add(channel.guild.id, "channels", -1)
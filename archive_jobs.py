@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+from atomic_file import write_json_atomic
+
+ARCHIVE_JOBS_PATH = "archive_jobs.json"
+
+
+class ArchiveJobStore:
+    """
+    アーカイブ処理をジョブとして保存する。
+    {job_id: {"guild_id", "source_id", "dest_id", "user_id", "status",
+              "last_message_id", "messages", "bytes", "elapsed", "updated_at"}}
+    last_message_id は保存先にコピー済みの最後の保存元メッセージID（チェックポイント）。
+    failures は送信・ダウンロードに失敗したメッセージごとの回数 {message_id: {"count", "error"}}、
+    skipped は何度やっても失敗したため飛ばした（添付をリンクにした）メッセージの記録。
+    """
+
+    def __init__(self, path: str = ARCHIVE_JOBS_PATH):
+        self.path = path
+        self.jobs = {}
+        self.next_id = 1
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ アーカイブジョブの読み込みに失敗しました: {e}")
+            return
+        self.jobs = {int(job_id): job for job_id, job in data.get("jobs", {}).items()}
+        self.next_id = data.get("next_id", max(self.jobs, default=0) + 1)
+
+    def save(self):
+        write_json_atomic(self.path, {"next_id": self.next_id, "jobs": self.jobs}, ensure_ascii=False, indent=2)
+
+    def find(self, source_id, dest_id):
+        for job_id, job in self.jobs.items():
+            if job["source_id"] == source_id and job["dest_id"] == dest_id:
+                return job_id
+        return None
+
+    def create(self, guild_id, source_id, dest_id, user_id):
+        job_id = self.next_id
+        self.next_id += 1
+        self.jobs[job_id] = {
+            "guild_id": guild_id,
+            "source_id": source_id,
+            "dest_id": dest_id,
+            "user_id": user_id,
+            "status": "running",
+            "last_message_id": None,
+            "messages": 0,
+            "bytes": 0,
+            "elapsed": 0.0,
+            "updated_at": time.time(),
+        }
+        self.save()
+        return job_id
+
+    def checkpoint(self, job_id, last_message_id, messages, size, elapsed):
+        job = self.jobs[job_id]
+        job["last_message_id"] = last_message_id
+        job["messages"] += messages
+        job["bytes"] += size
+        job["elapsed"] += elapsed
+        job["updated_at"] = time.time()
+        # チェックポイントより前のメッセージの失敗回数はもう使わない
+        failures = job.get("failures", {})
+        for message_id in [m for m in failures if int(m) <= last_message_id]:
+            del failures[message_id]
+        self.save()
+
+    def record_failure(self, job_id, message_id, error):
+        """
+        メッセージの失敗を記録し、これまでの失敗回数を返す（再開をまたいで数える）。
+        """
+        failure = self.jobs[job_id].setdefault("failures", {}).setdefault(str(message_id), {"count": 0, "error": ""})
+        failure["count"] += 1
+        failure["error"] = str(error)[:200]
+        self.save()
+        return failure["count"]
+
+    def record_skip(self, job_id, message_id, reason):
+        job = self.jobs[job_id]
+        job.setdefault("skipped", []).append({"message_id": message_id, "reason": reason, "at": time.time()})
+        job.get("failures", {}).pop(str(message_id), None)
+        self.save()
+
+    def record_peak_memory(self, job_id, peak):
+        job = self.jobs[job_id]
+        job["peak_memory"] = max(job.get("peak_memory", 0), peak)
+
+    def set_status(self, job_id, status):
+        self.jobs[job_id]["status"] = status
+        self.jobs[job_id]["updated_at"] = time.time()
+        self.save()
+
+    def unfinished(self):
+        return [job_id for job_id, job in self.jobs.items() if job["status"] == "running"]
+
+    def for_guild(self, guild_id):
+        return {job_id: job for job_id, job in self.jobs.items() if job["guild_id"] == guild_id}
@@ -0,0 +1,22 @@
+import json
+import os
+
+
+def write_text_atomic(path, text, backup=False):
+    """
+    一時ファイルに書いて fsync してから置き換える。途中で落ちても、前の内容か新しい内容のどちらかが残る。
+    backup=True なら置き換える前の内容を <path>.bak に残す。
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    if backup and os.path.exists(path):
+        os.replace(path, f"{path}.bak")
+    os.replace(tmp_path, path)
+
+
+def write_json_atomic(path, data, **kwargs):
+    # kwargs（ensure_ascii, indent など）は json.dumps にそのまま渡す
+    write_text_atomic(path, json.dumps(data, **kwargs))
@@ -0,0 +1,68 @@
+import tempfile
+import discord
+
+CHUNK_SIZE = 256 * 1024
+
+
+class MemoryBudget:
+    """
+    1ジョブがメモリ上に保持してよい添付ファイルの合計バイト数。
+    予約できない分は一時ファイル（ディスク）に書き出す。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+
+    def try_reserve(self, size: int) -> bool:
+        if self.used + size > self.limit:
+            return False
+        self.used += size
+        self.peak = max(self.peak, self.used)
+        return True
+
+    def release(self, size: int):
+        self.used = max(0, self.used - size)
+
+
+class SpooledAttachment:
+    """
+    チャンクごとに受け取った添付ファイルの中身。
+    予約できた場合はメモリ、できなかった場合は一時ファイルに置く。
+    """
+
+    def __init__(self, attachment, budget: MemoryBudget):
+        self.attachment = attachment
+        self.budget = budget
+        self.in_memory = budget.try_reserve(attachment.size)
+        if self.in_memory:
+            # サイズ申告より大きかった場合に備えて、上限を超えたらディスクへ切り替える
+            self.buffer = tempfile.SpooledTemporaryFile(max_size=max(attachment.size, 1))
+        else:
+            self.buffer = tempfile.TemporaryFile()
+
+    async def download(self, session, chunk_size: int = CHUNK_SIZE):
+        async with session.get(self.attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(chunk_size):
+                self.buffer.write(chunk)
+        self.buffer.seek(0)
+        return self
+
+    def to_file(self):
+        # 送信に失敗して1件ずつ送り直す場合もあるので、毎回先頭から読ませる
+        self.buffer.seek(0)
+        return discord.File(self.buffer, filename=self.attachment.filename, spoiler=self.attachment.is_spoiler())
+
+    def close(self):
+        self.buffer.close()
+        if self.in_memory:
+            self.budget.release(self.attachment.size)
+            self.in_memory = False
+
+
+def format_size(size: int) -> str:
+    if size >= 1048576:
+        return f"{size / 1048576:.1f}MB"
+    return f"{size / 1024:.0f}KB"
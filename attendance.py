@@ -0,0 +1,125 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from atomic_file import write_json_atomic
+
+ATTENDANCE_PATH = "attendance.json"
+KEEP_DAYS = 3
+DATE_FORMAT = "%Y/%m/%d"
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+
+class AttendanceStore:
+    """
+    フォーム回答から作る、ギルドごと・日付ごとの出退勤の状態。
+    {guild_id: {"since": str, "updated_at": str,
+                "days": {"YYYY/MM/DD": {正規化した名前: {"name", "in", "out"}}}}}
+    in / out はその日の最後の出勤・退勤のタイムスタンプ。
+    since は回答を漏れなく受け取り始めた時刻で、全件走査から始めた場合は空文字（最初から揃っている）。
+    updated_at は最後にシートを確認できた時刻（内容に変化が無かった回も含む）。
+    """
+
+    def __init__(self, path: str = ATTENDANCE_PATH, keep_days: int = KEEP_DAYS):
+        self.path = path
+        self.keep_days = keep_days
+        self.guilds = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.guilds = json.load(f)
+        except (OSError, ValueError) as e:
+            # 読めない場合は空から作り直す（since が付け直されるので前日分はシートから確認される）
+            print(f"⚠️ 出退勤の状態の読み込みに失敗しました: {e}")
+            self.guilds = {}
+
+    def save(self):
+        if not self._dirty:
+            return
+        write_json_atomic(self.path, self.guilds, ensure_ascii=False)
+        self._dirty = False
+
+    def _guild(self, guild_id):
+        return self.guilds.setdefault(str(guild_id), {"since": None, "updated_at": None, "days": {}})
+
+    def start_feed(self, guild_id, full_scan, now):
+        """
+        今回の回答の読み込みを始める前に呼ぶ。
+        全件走査なら過去分も揃うので since を空にし、途中からならまだ記録が無い場合だけ今の時刻にする。
+        """
+        state = self._guild(guild_id)
+        if full_scan and state["since"] != "":
+            state["since"] = ""
+            self._dirty = True
+        elif state["since"] is None:
+            state["since"] = now.strftime(TIMESTAMP_FORMAT)
+            self._dirty = True
+
+    def record(self, guild_id, key, record):
+        """
+        フォーム回答1件（FormRecord）を反映する。key は正規化した名前。
+        """
+        if record.date is None or record.status not in ("出勤", "退勤"):
+            return
+        state = self._guild(guild_id)
+        day = state["days"].setdefault(record.date.strftime(DATE_FORMAT), {})
+        entry = day.setdefault(key, {"name": record.name})
+        field = "in" if record.status == "出勤" else "out"
+        # フォームの時刻はゼロ埋めされないことがあるので、比較できる形にそろえて持つ
+        stamp = record.timestamp.strftime(TIMESTAMP_FORMAT)
+        if entry.get(field, "") < stamp:
+            entry[field] = stamp
+            self._dirty = True
+
+    def restart_feed(self, guild_id, now):
+        # now より前の回答は揃っていない（絞り込み取得で日付が変わった時など）
+        self._guild(guild_id)["since"] = now.strftime(TIMESTAMP_FORMAT)
+        self._dirty = True
+
+    def touch(self, guild_id, now):
+        # 毎回のポーリングで呼ぶので、これだけでは保存しない（他の変更と一緒に書き出す）
+        self._guild(guild_id)["updated_at"] = now.strftime(TIMESTAMP_FORMAT)
+
+    def covers(self, guild_id, date):
+        """
+        date の回答をすべて受け取っているか。途中から読み始めた日や、
+        date が終わってからまだシートを確認できていない場合（取得の失敗が続いている等）は False。
+        """
+        state = self.guilds.get(str(guild_id))
+        if state is None or state["since"] is None or state["updated_at"] is None:
+            return False
+        end = (date + timedelta(days=1)).strftime(DATE_FORMAT) + " 00:00:00"
+        return state["since"] <= date.strftime(DATE_FORMAT) + " 00:00:00" and state["updated_at"] >= end
+
+    def day(self, guild_id, date):
+        state = self.guilds.get(str(guild_id))
+        if state is None:
+            return {}
+        return state["days"].get(date.strftime(DATE_FORMAT), {})
+
+    def updated_at(self, guild_id):
+        state = self.guilds.get(str(guild_id))
+        return state["updated_at"] if state else None
+
+    def missing_retire(self, guild_id, date):
+        # 出勤したのに退勤の回答が無い人（正規化した名前）
+        return [key for key, entry in self.day(guild_id, date).items() if "in" in entry and "out" not in entry]
+
+    def present(self, guild_id, date):
+        # 今出勤中の人: 最後の出勤が最後の退勤より後
+        return [
+            entry for entry in self.day(guild_id, date).values()
+            if "in" in entry and entry["in"] > entry.get("out", "")
+        ]
+
+    def prune(self, today):
+        oldest = (datetime.strptime(today, DATE_FORMAT) - timedelta(days=self.keep_days - 1)).strftime(DATE_FORMAT)
+        for state in self.guilds.values():
+            for date in [d for d in state["days"] if d < oldest]:
+                del state["days"][date]
+                self._dirty = True
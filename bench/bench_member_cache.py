@@ -0,0 +1,129 @@
+"""
+メンバーキャッシュの通常モードと軽量モード（MEMBER_CACHE_MODE=lean）の比較。
+合成した大規模ギルドの GUILD_CREATE と、同じメンバーチャンクを両モードとも discord.py の
+チャンク処理（parse_guild_members_chunk）に流し、何をキャッシュするかは MemberCacheFlags に任せて、
+起動処理にかかる時間と最大RSSを測る。モードごとに別プロセスで実行する。
+起動時の /server 用の集計（GuildCounters.seed）も含める。軽量モードの正確なBot数は
+最初の /server でメンバー一覧APIを1周して数えるので、その分（人数/1000回のREST）は起動時間に含まない。
+
+    python bench/bench_member_cache.py --members 100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import discord
+from discord.state import ChunkRequest, ConnectionState
+
+from guild_stats import GuildCounters
+
+GUILD_ID = 1000
+CHUNK_SIZE = 1000  # Discordのメンバーチャンク1回あたりの人数
+
+
+def member_payload(i):
+    return {
+        "user": {
+            "id": str(10_000_000 + i),
+            "username": f"user{i}",
+            "global_name": f"ユーザー{i}",
+            "discriminator": "0",
+            "avatar": None,
+            "bot": i % 50 == 0,
+        },
+        "nick": None,
+        "roles": [str(GUILD_ID + 1)] if i % 3 == 0 else [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def guild_payload(members):
+    return {
+        "id": str(GUILD_ID),
+        "name": "bench",
+        "member_count": members,
+        "roles": [
+            {"id": str(GUILD_ID), "name": "@everyone", "permissions": "0", "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False},
+            {"id": str(GUILD_ID + 1), "name": "スタッフ", "permissions": "0", "position": 1, "color": 0, "hoist": False, "managed": False, "mentionable": False},
+        ],
+        "channels": [],
+        "members": [],
+        "emojis": [],
+        "features": [],
+    }
+
+
+def make_state(lean):
+    intents = discord.Intents.default()
+    intents.members = True
+    options = {"intents": intents}
+    if lean:
+        options["chunk_guilds_at_startup"] = False
+        options["member_cache_flags"] = discord.MemberCacheFlags.none()
+    state = ConnectionState(dispatch=lambda *a, **k: None, handlers={}, hooks={}, http=MagicMock(), **options)
+    state.loop = asyncio.new_event_loop()
+    return state
+
+
+def run(mode, members):
+    lean = mode == "lean"
+    state = make_state(lean)
+    started = time.perf_counter()
+    guild = state._add_guild_from_data(guild_payload(members))
+    # ConnectionState.chunk_guild と同じく、キャッシュするかどうかは member_cache_flags.joined で決まる
+    request = ChunkRequest(guild.id, 0, state.loop, state._get_guild, cache=state.member_cache_flags.joined)
+    state._chunk_requests[request.nonce] = request
+    chunk_count = (members + CHUNK_SIZE - 1) // CHUNK_SIZE
+    for chunk_index, offset in enumerate(range(0, members, CHUNK_SIZE)):
+        state.parse_guild_members_chunk({
+            "guild_id": str(GUILD_ID),
+            "members": [member_payload(i) for i in range(offset, min(offset + CHUNK_SIZE, members))],
+            "chunk_index": chunk_index,
+            "chunk_count": chunk_count,
+            "nonce": request.nonce,
+        })
+    counters = GuildCounters()
+    counters.seed(guild)
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "members": members,
+        "cached_members": len(guild.members),
+        "bots_exact_at_startup": counters.get(guild.id).bots_exact,
+        "startup_seconds": round(elapsed, 4),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--mode", choices=["default", "lean"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run(args.mode, args.members)))
+        return
+
+    # 各モードを別プロセスで実行して、RSSが互いに影響しないようにする
+    results = []
+    for mode in ("default", "lean"):
+        output = subprocess.check_output([sys.executable, __file__, "--mode", mode, "--members", str(args.members)])
+        results.append(json.loads(output))
+    print(json.dumps({"benchmark": "member_cache", "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+ベンチマーク用の偽Discordクライアント。
+Cogが使う範囲（ギルド・カテゴリ・テキストチャンネル・フォーラムとスレッド・ロール・メンバー）だけを
+discord.py のクラスを継承して作り、isinstance の判定はそのまま通るようにしている。
+send() は通信せずに Recorder に記録する。送信1回あたりの遅延を latency で指定できる。
+"""
+import asyncio
+import itertools
+import time
+
+import discord
+
+_ids = itertools.count(10_000)
+
+
+class Recorder:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sends = []
+
+    async def send(self, destination, content=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sends.append((time.perf_counter(), destination.id, content, kwargs.get("embeds", [])))
+
+    def count(self):
+        return len(self.sends)
+
+    def clear(self):
+        self.sends.clear()
+
+
+class FakeRole:
+    def __init__(self, name):
+        self.id = next(_ids)
+        self.name = name
+        self.mention = f"<@&{self.id}>"
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild, name, category=None):
+        self.id = next(_ids)
+        self.name = name
+        self.guild = guild
+        self.category_id = category.id if category else None
+        self.position = 0
+
+    @property
+    def category(self):
+        return self.guild.get_channel(self.category_id)
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.recorder.send(self, content, **kwargs)
+
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, guild, name):
+        self.id = next(_ids)
+        self.name = name
+        self.guild = guild
+        self.category_id = None
+        self.position = 0
+
+    @property
+    def channels(self):
+        return [c for c in self.guild.channels if getattr(c, "category_id", None) == self.id]
+
+
+class FakeForum(discord.ForumChannel):
+    def __init__(self, guild, name):
+        self.id = next(_ids)
+        self.name = name
+        self.guild = guild
+        self.category_id = None
+        self.position = 0
+
+    @property
+    def threads(self):
+        return [t for t in self.guild.threads if t.parent_id == self.id]
+
+
+class FakeThread(discord.Thread):
+    def __init__(self, guild, name, parent):
+        self.id = next(_ids)
+        self.name = name
+        self.guild = guild
+        self.parent_id = parent.id
+
+    @property
+    def parent(self):
+        return self.guild.get_channel(self.parent_id)
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.recorder.send(self, content, **kwargs)
+
+
+class FakeMember:
+    def __init__(self, guild, user_id, name):
+        self.guild = guild
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.bot = False
+        self.mention = f"<@{user_id}>"
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.recorder.send(self, content, **kwargs)
+
+
+class FakeGuild:
+    def __init__(self, guild_id, recorder, name="bench"):
+        self.id = guild_id
+        self.name = name
+        self.recorder = recorder
+        self.channels = []
+        self.threads = []
+        self.roles = []
+        self._channel_map = {}
+        self._members = {}
+        self.chunked = True
+
+    @property
+    def categories(self):
+        return [c for c in self.channels if isinstance(c, discord.CategoryChannel)]
+
+    @property
+    def text_channels(self):
+        return [c for c in self.channels if isinstance(c, discord.TextChannel)]
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    @property
+    def member_count(self):
+        return len(self._members)
+
+    def _add(self, channel):
+        self.channels.append(channel)
+        self._channel_map[channel.id] = channel
+        return channel
+
+    def add_text_channel(self, name, category=None):
+        return self._add(FakeTextChannel(self, name, category))
+
+    def add_category(self, name):
+        return self._add(FakeCategory(self, name))
+
+    def add_forum(self, name):
+        return self._add(FakeForum(self, name))
+
+    def add_thread(self, name, parent):
+        thread = FakeThread(self, name, parent)
+        self.threads.append(thread)
+        self._channel_map[thread.id] = thread
+        return thread
+
+    def add_role(self, name):
+        role = FakeRole(name)
+        self.roles.append(role)
+        return role
+
+    def add_member(self, user_id, name):
+        member = FakeMember(self, user_id, name)
+        self._members[user_id] = member
+        return member
+
+    def get_channel(self, channel_id):
+        return self._channel_map.get(channel_id)
+
+    get_channel_or_thread = get_channel
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+    async def fetch_member(self, user_id):
+        member = self._members.get(user_id)
+        if member is None:
+            raise discord.NotFound(_FakeResponse(404), "Unknown Member")
+        return member
+
+
+class _FakeResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "Not Found"
+
+
+class FakeBot:
+    """
+    Cogのコンストラクタとループが使う Bot の機能だけを持つ。
+    """
+
+    def __init__(self, guilds=()):
+        self.guilds = list(guilds)
+        self.user = None
+
+    async def wait_until_ready(self):
+        return
+
+    def is_ready(self):
+        return True
+
+    def get_guild(self, guild_id):
+        return next((g for g in self.guilds if g.id == guild_id), None)
+
+    def get_channel(self, channel_id):
+        for guild in self.guilds:
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                return channel
+        return None
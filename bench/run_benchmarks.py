@@ -0,0 +1,494 @@
+"""
+Botの主な処理のベンチマーク。ローカルのシート配信サーバー（sheets_server）と偽Discord（fake_discord）を使い、
+実際のCogのメソッドをそのまま呼んで時間を測る。結果はJSONで出力し、--compare で前回の結果と比べられる。
+
+    python bench/run_benchmarks.py --output bench_results.json
+    python bench/run_benchmarks.py --only form_responses,remind_loop --guilds 4 --rows 5000
+    python bench/run_benchmarks.py --compare old.json
+
+ベンチマーク:
+    form_responses   check_form_responses（初回 / 変化なし / 追記あり）
+    missing_retire   check_missing_retire（前日分の退勤漏れ集計。シートから / 出退勤の状態から）
+    jisseki          SpreadsheetCheckerCog.send_notification（実績シートの空欄チェック）
+    remind_loop      remind_loop（期限切れの大量リマインドの送信）
+    image            画像圧縮（従来の品質ループと compress_image の比較）
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytz
+from PIL import Image
+
+from fake_discord import FakeBot, FakeGuild, Recorder
+from sheets_server import FormLayout, SheetStandIn, form_rows, person_name
+from sheet_fetcher import SheetFetcher
+from sheet_cache import SheetCache
+from outbox import Outbox
+from guild_config import GuildConfigStore
+
+TZ = pytz.timezone("Asia/Tokyo")
+STAFF_CHANNEL = "スタッフ連絡"
+ROLE_NAME = "スタッフ"
+WORK_CHANNEL_NAME = "今日のお仕事"
+
+
+# ---- 共通 ----
+
+def build_world(stand_in, guilds, people, latency, fetch_mode="export"):
+    """
+    guilds 個のギルドに、利用者ごとの「今日のお仕事」（5人に1人はフォーラムのスレッド）を作る。
+    """
+    recorder = Recorder(latency)
+    config = {}
+    fake_guilds = []
+    for g in range(guilds):
+        guild = FakeGuild(1_000_000 + g, recorder, name=f"bench{g}")
+        guild.add_role(ROLE_NAME)
+        guild.add_text_channel(STAFF_CHANNEL)
+        for i in range(people):
+            if i % 5 == 4:
+                forum = guild.add_forum(person_name(i, g))
+                guild.add_thread(WORK_CHANNEL_NAME, forum)
+            else:
+                category = guild.add_category(person_name(i, g))
+                guild.add_text_channel(WORK_CHANNEL_NAME, category)
+        fake_guilds.append(guild)
+        config[str(guild.id)] = {
+            "SNS_LINK": "https://discord.com/channels/0/0",
+            "jisseki_alert_ch_name": STAFF_CHANNEL,
+            "mitaikin_alert_ch_name": STAFF_CHANNEL,
+            "syuttaikinn_url": stand_in.form_url(guild.id),
+            "jisseki_url": stand_in.jisseki_url(guild.id),
+            "check_from_form_time": "2000/01/01 00:00:00",
+            "role_name": ROLE_NAME,
+            "default_remind_channel": STAFF_CHANNEL,
+            "sheet_fetch_mode": fetch_mode,
+        }
+    return FakeBot(fake_guilds), GuildConfigStore(path=None, values=config), recorder
+
+
+@contextlib.contextmanager
+def workdir():
+    # Cogが作る状態ファイル（通知済みログ・ウォーターマーク等）は一時フォルダに置く
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
+
+
+def layout_from(args):
+    return FormLayout(preamble_rows=args.preamble_rows, extra_columns=args.extra_columns, shuffle=args.shuffle_columns)
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+def expect(name, actual, low, high=None):
+    # 通知が重複判定などで消えていたら、数字を出さずに失敗させる
+    high = low if high is None else high
+    if not low <= actual <= high:
+        expected = low if low == high else f"{low}〜{high}"
+        raise RuntimeError(f"{name} が {actual} でした（期待値 {expected}）")
+
+
+# ---- ベンチマーク ----
+
+async def bench_form_responses(args):
+    from form_watcher import FormWatcherCog
+
+    stand_in = SheetStandIn(layout_from(args))
+    await stand_in.start()
+    fetcher = SheetFetcher()
+    try:
+        bot, config, recorder = build_world(stand_in, args.guilds, args.people, args.latency, args.fetch_mode)
+        today = datetime.now(TZ).date()
+        # --history-days の日数分、過去の回答を前に積んでおく（全件取得と絞り込み取得の差が出る）
+        for g, guild in enumerate(bot.guilds):
+            history = []
+            for days_ago in range(args.history_days, 0, -1):
+                history += form_rows(args.rows, args.people, today - timedelta(days=days_ago), stand_in.layout, group=g)
+            stand_in.set_form(guild.id, history + form_rows(args.rows, args.people, today, stand_in.layout, seed=guild.id, group=g))
+
+        # TTL=0 にして毎回シートを再検証させる（1分ごとのポーリングと同じ条件）
+        outbox = Outbox()
+        cog = FormWatcherCog(bot, config, SheetCache(fetcher, ttl=0), outbox)
+        cog.cog_unload()
+        for guild in bot.guilds:
+            cog.routes.build(guild)
+
+        # ループ自体は送信を待たないので、送信キューが空になるまでの時間は別に測る
+        cold = await timed(cog.check_form_responses())
+        cold_drain = await timed(outbox.join())
+        cold_sends = recorder.count()
+        # 1人につき出勤・退勤の2件（行数が足りなければ行数分）。送信は宛先ごとにまとまるので、人数〜件数の範囲
+        notified_per_guild = min(args.rows, 2 * args.people)
+        expect("cold_notified", len(cog.notified_entries.keys), args.guilds * notified_per_guild)
+        expect("cold_sends", cold_sends, args.guilds * min(args.rows, args.people), args.guilds * notified_per_guild)
+        unchanged = await timed(cog.check_form_responses())
+
+        # 追記分は通知済みの人の出勤なので、解析はするが送信は増えない
+        added = max(1, args.rows // 100)
+        for g, guild in enumerate(bot.guilds):
+            rows = form_rows(added, args.people, today, stand_in.layout, seed=guild.id + 1, start_minute=600, group=g)
+            stand_in.append_form(guild.id, rows)
+        recorder.clear()
+        appended = await timed(cog.check_form_responses())
+        await outbox.join()
+        expect("appended_sends", recorder.count(), 0)
+
+        return {
+            "cold_seconds": cold,
+            "cold_drain_seconds": cold_drain,
+            "unchanged_seconds": unchanged,
+            "appended_seconds": appended,
+            "rows_per_guild": args.rows,
+            "history_rows_per_guild": len(history),
+            "appended_rows_per_guild": added,
+            "cold_sends": cold_sends,
+            "cold_notified": len(cog.notified_entries.keys),
+            "appended_sends": recorder.count(),
+            "http_requests": stand_in.requests,
+            "http_not_modified": stand_in.not_modified,
+            "http_query_requests": stand_in.query_requests,
+            "http_bytes": stand_in.bytes_sent,
+        }
+    finally:
+        await fetcher.close()
+        await stand_in.stop()
+
+
+async def bench_missing_retire(args):
+    from form_watcher import FormWatcherCog
+
+    stand_in = SheetStandIn(layout_from(args))
+    await stand_in.start()
+    fetcher = SheetFetcher()
+    try:
+        bot, config, recorder = build_world(stand_in, args.guilds, args.people, args.latency, args.fetch_mode)
+        yesterday = (datetime.now(TZ) - timedelta(days=1)).date()
+        # 1.5人分の行数 → 半数は出勤だけで退勤が無い
+        rows = args.people + args.people // 2
+        for g, guild in enumerate(bot.guilds):
+            filler = form_rows(max(0, args.rows - rows), args.people, yesterday - timedelta(days=1), stand_in.layout, group=g)
+            stand_in.set_form(guild.id, filler + form_rows(rows, args.people, yesterday, stand_in.layout, seed=guild.id, group=g))
+
+        outbox = Outbox()
+        cog = FormWatcherCog(bot, config, SheetCache(fetcher), outbox)
+        cog.cog_unload()
+        cold = await timed(cog.check_missing_retire())
+        await outbox.join()
+        alerts = recorder.count()
+        expect("alerts", alerts, args.guilds)
+        # 同じ日の分は二度通知しない
+        recorder.clear()
+        await cog.check_missing_retire()
+        await outbox.join()
+        expect("repeated_alerts", recorder.count(), 0)
+
+        # 2回目以降は、通知済みかどうかに関係なくギルドごとの確認そのものを測る
+        async def check_all():
+            await asyncio.gather(*(cog.check_guild_missing_retire(guild, yesterday) for guild in bot.guilds))
+
+        cached = await timed(check_all())
+        await outbox.join()
+        fetch_requests = stand_in.requests
+
+        # 日中の check_form_responses で出退勤の状態ができていれば、シートを取り直さずに済む
+        for guild in bot.guilds:
+            cog.routes.build(guild)
+        await cog.check_form_responses()
+        await outbox.join()
+        requests_before = stand_in.requests
+        from_state = await timed(check_all())
+        await outbox.join()
+
+        return {
+            "cold_seconds": cold,
+            "cached_seconds": cached,
+            "from_state_seconds": from_state,
+            "rows_per_guild": len(filler) + rows,
+            "alerts": alerts,
+            "http_requests": fetch_requests,
+            "from_state_http_requests": stand_in.requests - requests_before,
+        }
+    finally:
+        await fetcher.close()
+        await stand_in.stop()
+
+
+async def bench_jisseki(args):
+    from spreadsheet_checker import SpreadsheetCheckerCog
+
+    stand_in = SheetStandIn()
+    await stand_in.start()
+    fetcher = SheetFetcher()
+    try:
+        bot, config, recorder = build_world(stand_in, args.guilds, args.people, args.latency, args.fetch_mode)
+        day = datetime.now(TZ).day
+        for guild in bot.guilds:
+            stand_in.set_jisseki(guild.id, args.people, day, missing_ratio=0.3, seed=guild.id)
+
+        outbox = Outbox()
+        cog = SpreadsheetCheckerCog(bot, config, SheetCache(fetcher), outbox)
+        cog.cog_unload()
+        cold = await timed(cog.send_notification())
+        await outbox.join()
+        alerts = recorder.count()
+        cached = await timed(cog.send_notification())
+        await outbox.join()
+
+        return {
+            "cold_seconds": cold,
+            "cached_seconds": cached,
+            "alerts": alerts,
+            "http_requests": stand_in.requests,
+            "http_query_requests": stand_in.query_requests,
+            "http_bytes": stand_in.bytes_sent,
+        }
+    finally:
+        await fetcher.close()
+        await stand_in.stop()
+
+
+async def bench_remind_loop(args):
+    from remind import RemindCog
+    from reminder_store import ReminderStore
+
+    stand_in = SheetStandIn()
+    bot, config, recorder = build_world(stand_in, args.guilds, 0, args.latency)
+    for guild in bot.guilds:
+        for user_id in range(1, 101):
+            guild.add_member(user_id, f"user{user_id}")
+
+    # 期限を過ぎたリマインドを用意する（1/3は非公開DM、1/4は毎日繰り返し）
+    due = datetime.now(TZ) - timedelta(minutes=1)
+    store = ReminderStore()
+    for i in range(args.reminders):
+        guild = bot.guilds[i % len(bot.guilds)]
+        store.add(str(guild.id), {
+            "message": f"リマインド{i}",
+            "date": due.strftime("%Y%m%d"),
+            "time": due.strftime("%H:%M"),
+            "mention_target": "",
+            "channel_id": None,
+            "公開": i % 3 != 0,
+            "repeat": "daily" if i % 4 == 0 else "once",
+            "user_id": i % 100 + 1,
+            "user_tag": "bench",
+        })
+    store.flush()
+
+    started = time.perf_counter()
+    outbox = Outbox()
+    cog = RemindCog(bot, config, outbox)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await cog.cog_load()
+    try:
+        # 期限切れのリマインドがすべて取り出され、送信キューが空になるまで
+        while cog._queue and cog._queue[0][0] <= datetime.now(TZ):
+            if time.perf_counter() - started > args.timeout:
+                break
+            await asyncio.sleep(0.005)
+        await asyncio.wait_for(outbox.join(), timeout=max(0.0, args.timeout - (time.perf_counter() - started)))
+        fire_seconds = time.perf_counter() - started
+    finally:
+        cog.cog_unload()
+        await outbox.close()
+
+    # 同じチャンネル宛ては1通にまとめて送られるので、本文に含まれるリマインドの数を数える
+    fired = sum(len(re.findall(r"リマインド\d+", content or "")) for _, _, content, _ in recorder.sends)
+    return {
+        "reminders": args.reminders,
+        "load_seconds": load_seconds,
+        "fire_seconds": fire_seconds,
+        "fired": fired,
+        "messages_sent": recorder.count(),
+        "per_reminder_ms": fire_seconds / fired * 1000 if fired else None,
+        "remaining_scheduled": len(cog._queue),
+    }
+
+
+def synthetic_photo(width, height, seed=0):
+    # 写真に近いよう、なめらかなグラデーションに細かいノイズを重ねる
+    gradient = Image.linear_gradient("L").resize((width, height))
+    base = Image.merge("RGB", (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), gradient.rotate(90).resize((width, height))))
+    noise = Image.effect_noise((width, height), 40 + seed).convert("RGB")
+    return Image.blend(base, noise, 0.35)
+
+
+def legacy_compress(input_path, output_path, max_size_bytes=1048576):
+    """
+    比較用: 以前の /画像圧縮 と同じ、品質95から5ずつ下げてファイルに書く方式。
+    """
+    img = Image.open(input_path)
+    img = img.convert("RGBA" if img.mode in ("RGBA", "LA") else "RGB")
+    quality, encodes = 95, 0
+    while quality > 10:
+        img.save(output_path, format="WEBP", quality=quality, method=6)
+        encodes += 1
+        if os.path.getsize(output_path) <= max_size_bytes:
+            return encodes, quality, os.path.getsize(output_path)
+        quality -= 5
+    return encodes, None, None
+
+
+async def bench_image(args):
+    from image_utils import compress_image
+
+    results = {}
+    for size in args.image_sizes.split(","):
+        width, height = (int(v) for v in size.split("x"))
+        source = os.path.join(os.getcwd(), f"photo_{size}.png")
+        synthetic_photo(width, height).save(source)
+
+        started = time.perf_counter()
+        encodes, quality, out_size = legacy_compress(source, os.path.join(os.getcwd(), "legacy.webp"))
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = compress_image(source, os.path.join(os.getcwd(), "current.webp"))
+        current_seconds = time.perf_counter() - started
+
+        results[size] = {
+            "legacy_seconds": legacy_seconds,
+            "legacy_encodes": encodes,
+            "legacy_quality": quality,
+            "legacy_bytes": out_size,
+            "current_seconds": current_seconds,
+            "current_encodes": result.encodes,
+            "current_quality": result.quality,
+            "current_bytes": result.size,
+            "current_dimensions": f"{result.width}x{result.height}",
+        }
+    return results
+
+
+BENCHMARKS = {
+    "form_responses": bench_form_responses,
+    "missing_retire": bench_missing_retire,
+    "jisseki": bench_jisseki,
+    "remind_loop": bench_remind_loop,
+    "image": bench_image,
+}
+
+
+# ---- 集計・出力 ----
+
+def aggregate(runs):
+    """
+    *_seconds は中央値と最小値、それ以外は最後の実行の値を使う。
+    """
+    if isinstance(runs[-1], dict) and all(isinstance(v, dict) for v in runs[-1].values()):
+        return {key: aggregate([run[key] for run in runs]) for key in runs[-1]}
+    result = {}
+    for key, value in runs[-1].items():
+        if key.endswith("_seconds"):
+            values = [run[key] for run in runs]
+            result[key] = round(statistics.median(values), 6)
+            result[key.replace("_seconds", "_min_seconds")] = round(min(values), 6)
+        else:
+            result[key] = value
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, prefix=""):
+    lines = []
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            lines.extend(compare(value, old or {}, f"{prefix}{key}."))
+        elif key.endswith("_seconds") and "_min_" not in key and isinstance(old, (int, float)) and old:
+            lines.append(f"{prefix}{key}: {old:.4f}s → {value:.4f}s（×{value / old:.2f}）")
+    return lines
+
+
+async def run(args):
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    results = {}
+    for name in names:
+        runs = []
+        for _ in range(args.repeat if name != "image" else 1):
+            with workdir():
+                runs.append(await BENCHMARKS[name](args))
+        results[name] = aggregate(runs)
+        print(f"{name}: 完了", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", help="実行するベンチマーク（カンマ区切り）")
+    parser.add_argument("--guilds", type=int, default=2)
+    parser.add_argument("--people", type=int, default=50, help="ギルドあたりの利用者数")
+    parser.add_argument("--rows", type=int, default=2000, help="ギルドあたりのフォーム回答行数")
+    parser.add_argument("--preamble-rows", type=int, default=0, help="ヘッダーの前に入れる行数")
+    parser.add_argument("--extra-columns", type=int, default=0, help="フォームに足す余分な列数")
+    parser.add_argument("--shuffle-columns", action="store_true", help="フォームの列の並びを入れ替える")
+    parser.add_argument("--history-days", type=int, default=0, help="form_responses で前に積む過去の日数（1日あたり --rows 行）")
+    parser.add_argument("--fetch-mode", choices=["export", "query"], default="export", help="シートの取得方法（config の sheet_fetch_mode）")
+    parser.add_argument("--reminders", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.0, help="偽Discordの送信1回あたりの遅延（秒）")
+    parser.add_argument("--image-sizes", default="1600x1200,3000x2000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120, help="remind_loop の打ち切り時間（秒）")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル")
+    parser.add_argument("--compare", help="比較する以前の結果のJSON")
+    args = parser.parse_args()
+
+    # Cogの print() はJSON出力と混ざらないよう標準エラーに回す
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run(args))
+
+    report = {
+        "suite": "discord-bot",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "started_at": datetime.now(TZ).isoformat(timespec="seconds"),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        for line in compare(results, baseline.get("results", {})):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
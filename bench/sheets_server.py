@@ -0,0 +1,234 @@
+"""
+ベンチマーク用のGoogleスプレッドシート（CSVエクスポート）の代わりになるローカルHTTPサーバー。
+ギルドごとに出退勤フォームの回答シートと実績シートを生成して配信する。
+ETag / If-None-Match に対応し、304 も返す。URLは本物と同じ形にしている。
+
+    /spreadsheets/d/bench<guild_id>/export?format=csv&gid=1   出退勤フォームの回答（お名前・タイムスタンプ・出退勤 ...）
+    /spreadsheets/d/bench<guild_id>/export?format=csv&gid=2   実績シート（4行目が日付、7〜18行目が入力欄）
+    /spreadsheets/d/bench<guild_id>/gviz/tq?tqx=out:csv&gid=...
+
+gviz/tq と export の range は sheet_query が使う範囲だけを実装している。
+    gviz/tq?tq=select * where <列> >= datetime 'YYYY-MM-DD HH:MM:SS'   （ヘッダー行 + 条件に合う行）
+    export?range=4:4 / export?range=D7:D18                             （A1形式の範囲だけ）
+"""
+import csv
+import hashlib
+import io
+import random
+import re
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S"
+FORM_COLUMNS = [
+    "タイムスタンプ", "お名前", "出退勤", "体温", "体調", "体調備考", "本日の作業予定", "本日の目標",
+    "本日の作業内容", "感想", "特記事項",
+    "目標通りの作業ができた", "順調に作業がすすめられた", "間違いに気づき、直すことができた",
+    "作業準備・整理整頓ができた", "必要に応じた報告・連絡・相談ができた", "集中して取り組むことができた",
+    "楽しい時間を過ごすことができた",
+]
+JISSEKI_DATE_ROW = 3
+JISSEKI_FIRST_ROW = 6
+JISSEKI_LAST_ROW = 18
+JISSEKI_FIRST_COL = 2
+FORM_GID = "1"
+JISSEKI_GID = "2"
+WHERE_PATTERN = re.compile(r"select \* where ([A-Z]+) >= datetime '(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})'$")
+RANGE_PATTERN = re.compile(r"([A-Z]*)(\d*):([A-Z]*)(\d*)$")
+
+
+def person_name(i, group=0):
+    # ギルドごとに別の人にする（同じ名前だと通知済みの判定がギルドをまたいで効いているか分からない）
+    return f"利用者{group}-{i:04d}"
+
+
+class FormLayout:
+    """
+    回答シートの列の並び。ヘッダーの前に説明行を入れたり、列を入れ替えたり、余分な列を足したりできる。
+    """
+
+    def __init__(self, preamble_rows=0, extra_columns=0, shuffle=False, seed=0):
+        columns = list(FORM_COLUMNS) + [f"予備{i}" for i in range(extra_columns)]
+        if shuffle:
+            random.Random(seed).shuffle(columns)
+        self.columns = columns
+        self.preamble_rows = preamble_rows
+
+
+def form_rows(count, people, day, layout, seed=0, start_minute=0, group=0):
+    """
+    day の日付で、people 人（person_name(i, group)）が出勤 → 退勤する回答を count 行作る（時刻順）。
+    """
+    rng = random.Random(seed)
+    base = datetime(day.year, day.month, day.day, 8, 0, 0)
+    rows = []
+    for i in range(count):
+        person = i % people
+        status = "出勤" if (i // people) % 2 == 0 else "退勤"
+        values = {
+            "タイムスタンプ": (base + timedelta(seconds=(start_minute * 60) + i * 3)).strftime(TIMESTAMP_FORMAT),
+            "お名前": person_name(person, group),
+            "出退勤": status,
+        }
+        if status == "出勤":
+            values.update({
+                "体温": f"36.{rng.randint(0, 9)}",
+                "体調": rng.choice(["良好", "普通", "少し疲れ気味"]),
+                "本日の作業予定": "データ入力, 画像編集, ブログ作成",
+                "本日の目標": "集中して作業する",
+            })
+        else:
+            values.update({
+                "本日の作業内容": "データ入力を進めました",
+                "感想": "順調でした",
+                "目標通りの作業ができた": str(rng.randint(1, 5)),
+                "集中して取り組むことができた": str(rng.randint(1, 5)),
+            })
+        rows.append([values.get(col, "") for col in layout.columns])
+    return rows
+
+
+def column_index(letters):
+    index = 0
+    for ch in letters:
+        index = index * 26 + (ord(ch) - ord("A") + 1)
+    return index - 1
+
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\r\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+class SheetStandIn:
+    """
+    ギルドごとのシートを保持して配信する。append_form() で回答を追記すると内容（ETag）が変わる。
+    """
+
+    def __init__(self, layout=None):
+        self.layout = layout or FormLayout()
+        self.forms = {}      # {guild_id: [rows]}
+        self.sheets = {}     # {(sheet_id, gid): (rows, header_index)}
+        self._bodies = {}    # {((sheet_id, gid), クエリ文字列): (本文, ETag)}
+        self.requests = 0
+        self.query_requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._runner = None
+        self.base_url = None
+
+    def set_form(self, guild_id, rows):
+        self.forms[guild_id] = list(rows)
+        self._publish_form(guild_id)
+
+    def append_form(self, guild_id, rows):
+        self.forms[guild_id].extend(rows)
+        self._publish_form(guild_id)
+
+    def _publish_form(self, guild_id):
+        preamble = [["フォームの回答"] + [""] * (len(self.layout.columns) - 1)] * self.layout.preamble_rows
+        rows = preamble + [self.layout.columns] + self.forms[guild_id]
+        self._set_sheet((f"bench{guild_id}", FORM_GID), rows, self.layout.preamble_rows)
+
+    def _set_sheet(self, key, rows, header_index):
+        self.sheets[key] = (rows, header_index)
+        self._bodies = {k: v for k, v in self._bodies.items() if k[0] != key}
+
+    def set_jisseki(self, guild_id, people, day, missing_ratio=0.0, seed=0):
+        """
+        実績シート。日付行は1〜31日、day 列の入力欄のうち missing_ratio の割合を空欄にする。
+        """
+        rng = random.Random(seed)
+        width = JISSEKI_FIRST_COL + 31
+        rows = [[""] * width for _ in range(max(JISSEKI_LAST_ROW, JISSEKI_FIRST_ROW + people))]
+        rows[0][0] = "実績記録表"
+        for d in range(1, 32):
+            rows[JISSEKI_DATE_ROW][JISSEKI_FIRST_COL + d - 1] = str(d)
+        for r in range(JISSEKI_FIRST_ROW, len(rows)):
+            rows[r][0] = person_name(r - JISSEKI_FIRST_ROW)
+            for d in range(1, 32):
+                filled = d != day or rng.random() >= missing_ratio
+                rows[r][JISSEKI_FIRST_COL + d - 1] = "○" if filled else ""
+        self._set_sheet((f"bench{guild_id}", JISSEKI_GID), rows, None)
+
+    def form_url(self, guild_id):
+        return f"{self.base_url}/spreadsheets/d/bench{guild_id}/export?format=csv&gid={FORM_GID}"
+
+    def jisseki_url(self, guild_id):
+        return f"{self.base_url}/spreadsheets/d/bench{guild_id}/export?format=csv&gid={JISSEKI_GID}"
+
+    def query(self, rows, header_index, params):
+        """
+        gviz/tq の一部。対応していない問い合わせは ValueError。
+        """
+        tq = params.get("tq")
+        if tq:
+            match = WHERE_PATTERN.match(tq.strip())
+            if not match or header_index is None:
+                raise ValueError(f"unsupported query: {tq}")
+            col = column_index(match.group(1))
+            # 生成する回答のタイムスタンプはゼロ埋めなので文字列のまま比べる（サーバー側の処理時間を計測に混ぜない）
+            since = datetime.strptime(match.group(2), "%Y-%m-%d %H:%M:%S").strftime(TIMESTAMP_FORMAT)
+            selected = [row for row in rows[header_index + 1:] if col < len(row) and row[col] >= since]
+            return [rows[header_index]] + selected
+
+        cell_range = params.get("range")
+        if cell_range:
+            match = RANGE_PATTERN.match(cell_range)
+            if not match:
+                raise ValueError(f"unsupported range: {cell_range}")
+            col1, row1, col2, row2 = match.groups()
+            r1 = int(row1) - 1 if row1 else 0
+            r2 = int(row2) if row2 else len(rows)
+            c1 = column_index(col1) if col1 else 0
+            c2 = column_index(col2) + 1 if col2 else None
+            selected = [row[c1:c2] for row in rows[r1:r2]]
+            # 範囲の末尾の空行は返さない（行が足りなくても空欄として判定できることを確かめる）
+            while selected and not any(cell.strip() for cell in selected[-1]):
+                selected.pop()
+            return selected
+        raise ValueError("tq or range is required")
+
+    async def handle(self, request):
+        key = (request.match_info["sheet"], request.query.get("gid", "0"))
+        sheet = self.sheets.get(key)
+        if sheet is None:
+            raise web.HTTPNotFound()
+        is_query = request.match_info["kind"] == "gviz/tq" or "range" in request.query
+        if is_query:
+            self.query_requests += 1
+        cached = self._bodies.get((key, request.query_string))
+        if cached is None:
+            rows, header_index = sheet
+            if is_query:
+                try:
+                    rows = self.query(rows, header_index, request.query)
+                except ValueError as e:
+                    raise web.HTTPBadRequest(text=str(e))
+            body = to_csv(rows)
+            cached = self._bodies[(key, request.query_string)] = (body, '"%s"' % hashlib.md5(body).hexdigest())
+        body, etag = cached
+        self.requests += 1
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type="text/csv", headers={"ETag": etag})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/spreadsheets/d/{sheet}/{kind:export|gviz/tq}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,13 +1,33 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import os
-from PIL import Image
 import tempfile
 
+from image_cache import INDEX_SAVE_INTERVAL, ImageCache, content_key
+from image_pool import ImageEncodePool, QueueFull
+
+MAX_IMAGE_BYTES = 1048576
+
 class BlogUploaderCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # エンコードはプロセスプールで行い、イベントループ（リマインドやフォーム監視）を止めない
+        self.encoder = ImageEncodePool()
+        self.cache = ImageCache()
+        self.save_cache_index.start()
+
+    def cog_unload(self):
+        self.save_cache_index.cancel()
+        self.cache.save()
+        self.encoder.shutdown()
+
+    @tasks.loop(seconds=INDEX_SAVE_INTERVAL)
+    async def save_cache_index(self):
+        try:
+            await self.cache.save_in_background()
+        except OSError as e:
+            print(f"⚠️ 画像キャッシュの目次の保存に失敗しました: {e}")
 
     @app_commands.command(name="画像圧縮", description="画像を1MB未満に圧縮して送信します（WebP形式）")
     @app_commands.describe(
@@ -16,42 +36,67 @@ class BlogUploaderCog(commands.Cog):
     async def post_image(self, interaction: discord.Interaction, 画像: discord.Attachment):
         await interaction.response.defer(thinking=True, ephemeral=True)
 
-        try:
-            temp_dir = tempfile.gettempdir()
-            original_path = os.path.join(temp_dir, 画像.filename)
-            await 画像.save(original_path)
+        async def show_position(position):
+            if position > 0:
+                content = f"⏳ 順番待ち中です（{position}番目）"
+            else:
+                content = "🔄 圧縮しています..."
+            try:
+                await interaction.edit_original_response(content=content)
+            except discord.HTTPException:
+                pass
 
-            # 拡張子だけwebpに変更したファイル名を作成
-            original_name, _ = os.path.splitext(画像.filename)
-            compressed_path = os.path.join(temp_dir, f"{original_name}.webp")
+        # 拡張子だけwebpに変更したファイル名を作成
+        original_name, ext = os.path.splitext(画像.filename)
+        output_name = f"{original_name}.webp"
+        original_path = None
+        tmp_output = None
 
-            img = Image.open(original_path)
+        try:
+            data = await 画像.read()
+            key = content_key(data, MAX_IMAGE_BYTES)
 
-            # 透過対応
-            if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
-                img = img.convert("RGBA")
+            # 同じ画像は前回の圧縮結果をそのまま返す（エンコードしない）
+            cached = self.cache.get(key)
+            if cached is not None:
+                compressed_path, meta = cached
+                note = "（キャッシュ）"
             else:
-                img = img.convert("RGB")
-
-            # WebP圧縮処理
-            quality = 95
-            while quality > 10:
-                img.save(compressed_path, format="WEBP", quality=quality, method=6)
-                if os.path.getsize(compressed_path) <= 1048576:
-                    break
-                quality -= 5
-            else:
-                raise Exception("画像を1MB未満に圧縮できませんでした")
+                # 元のファイル名のまま一時フォルダに置くと同時利用で上書きし合うので一意な名前にする
+                fd, original_path = tempfile.mkstemp(suffix=ext)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                del data
+                tmp_output = self.cache.reserve(key)
+
+                # WebP圧縮処理（image_utils.compress_image をワーカープロセスで実行）
+                result = await self.encoder.compress(
+                    interaction.user.id, original_path, tmp_output,
+                    max_size_bytes=MAX_IMAGE_BYTES, on_position=show_position,
+                )
+                compressed_path, meta = self.cache.put(key, tmp_output, result)
+                tmp_output = None
+                note = f"（エンコード{result.encodes}回）"
+                print(f"🖼️ 画像圧縮: {画像.filename} → 品質{result.quality} {result.width}x{result.height} "
+                      f"{result.size}B（エンコード{result.encodes}回）")
 
-            size_kb = round(os.path.getsize(compressed_path) / 1024, 2)
+            size_kb = round(meta["size"] / 1024, 2)
             await interaction.followup.send(
                 content=(
-                    f"✅ 圧縮画像が完成しました！（WebP形式） `{os.path.basename(compressed_path)}`\n"
-                    f"サイズ：{size_kb}KB / 1024KB `1MB=1024KB`"
+                    f"✅ 圧縮画像が完成しました！（WebP形式） `{output_name}`\n"
+                    f"サイズ：{size_kb}KB / 1024KB `1MB=1024KB`\n"
+                    f"品質：{meta['quality']} / {meta['width']}x{meta['height']}{note}"
                 ),
-                file=discord.File(compressed_path),
+                file=discord.File(compressed_path, filename=output_name),
                 ephemeral=True
             )
 
+        except QueueFull as e:
+            await interaction.followup.send(f"⚠️ {e}", ephemeral=True)
         except Exception as e:
             await interaction.followup.send(f"❌ エラーが発生しました: {str(e)}", ephemeral=True)
+        finally:
+            if original_path:
+                os.remove(original_path)
+            if tmp_output:
+                self.cache.discard(tmp_output)
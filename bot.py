@@ -1,117 +1,113 @@
 import os
 from dotenv import load_dotenv  # type: ignore
 import discord
-from discord import app_commands
 from discord.ext import commands
 import asyncio
-import json
+import time
 
 from spreadsheet_checker import SpreadsheetCheckerCog
 from blog_uploader import BlogUploaderCog
 from form_watcher import FormWatcherCog
 from remind import RemindCog
+from archive import ArchiveCog
+from sheet_fetcher import SheetFetcher
+from sheet_cache import SheetCache
+from outbox import Outbox
+from guild_config import GuildConfigCog, GuildConfigStore
+from command_sync import sync_if_changed
+from stats import StatsCog
+from metrics import install_rate_limit_counter
 
 # 環境変数を読み込む
 load_dotenv()
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 
-# 設定ファイル読み込み
-with open("config.json", "r", encoding="utf-8") as f:
-    CONFIG = json.load(f)
+# COMMAND_SYNC_GUILD=<ギルドID> でそのギルドだけに即時同期（開発用）
+COMMAND_SYNC_GUILD = os.getenv("COMMAND_SYNC_GUILD")
+# FORCE_COMMAND_SYNC=1 でツリーに変化が無くても同期する
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC") == "1"
+
+# 起動の各段階にかかった時間（秒）
+STARTUP_TIMINGS = {}
+
+# 設定ファイル読み込み（全Cogで共有し、更新されたら読み直す）
+_started = time.perf_counter()
+CONFIG = GuildConfigStore("config.json")
+STARTUP_TIMINGS["config"] = time.perf_counter() - _started
 
 # ボットの設定
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True  # メンバー情報取得のため
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-class ArchiveCog(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
-
-    @app_commands.command(name="archive_ch_th", description="チャンネルの内容をフォーラム投稿にコピーします")
-    @app_commands.describe(
-        保存元="保存元のチャンネル", 
-        保存先="保存先のフォーラム投稿（スレッド）"
-    )
-    async def archive_ch_th(self, interaction: discord.Interaction, 保存元: discord.TextChannel, 保存先: discord.Thread):
-        await self._archive_messages(interaction, 保存元, 保存先)
 
-    @app_commands.command(name="archive_th_th", description="フォーラム投稿の内容を別のフォーラム投稿にコピーします")
-    @app_commands.describe(
-        保存元="保存元のフォーラム投稿（スレッド）",
-        保存先="保存先のフォーラム投稿（スレッド）"
+# MEMBER_CACHE_MODE=lean で起動時のチャンク取得とメンバーキャッシュを行わない
+# （/server の人数はイベントで数え、リマインドのDM宛先は必要な時だけ取得する）
+LEAN_MEMBER_CACHE = os.getenv("MEMBER_CACHE_MODE", "").lower() == "lean"
+if LEAN_MEMBER_CACHE:
+    bot = commands.Bot(
+        command_prefix="!",
+        intents=intents,
+        chunk_guilds_at_startup=False,
+        member_cache_flags=discord.MemberCacheFlags.none(),
     )
-    async def archive_th_th(self, interaction: discord.Interaction, 保存元: discord.Thread, 保存先: discord.Thread):
-        await self._archive_messages(interaction, 保存元, 保存先)
-
-    async def _archive_messages(self, interaction: discord.Interaction, 保存元: discord.abc.Messageable, 保存先: discord.Thread):
-        await interaction.response.defer(thinking=True, ephemeral=True)
-        messages = [msg async for msg in 保存元.history(limit=100)]
-
-        if not messages:
-            await interaction.followup.send("保存元にメッセージがありません。", ephemeral=True)
-            return
-
-        for message in reversed(messages):
-            try:
-                if not message.content and not message.attachments:
-                    continue
-                avatar_url = message.author.display_avatar.url
-                embed = discord.Embed(description=message.content or "", timestamp=message.created_at)
-                embed.set_author(name=message.author.display_name, icon_url=avatar_url)
-                if message.attachments:
-                    for attachment in message.attachments:
-                        await 保存先.send(embed=embed, file=await attachment.to_file())
-                else:
-                    await 保存先.send(embed=embed)
-                await asyncio.sleep(0.5)
-            except Exception as e:
-                print(f"メッセージ送信中にエラーが発生しました: {e}")
-
-        await interaction.followup.send(f"保存元: {保存元.mention} のメッセージをスレッド: {保存先.mention} に保存しました！", ephemeral=True)
-
-    @app_commands.command(name="server", description="サーバーの情報を表示します")
-    async def server_info(self, interaction: discord.Interaction):
-        guild = interaction.guild
-        if not guild:
-            await interaction.response.send_message("このコマンドはサーバー内でのみ使用できます。", ephemeral=True)
-            return
-
-        total_members = guild.member_count
-        bot_count = sum(1 for member in guild.members if member.bot)
-        human_count = total_members - bot_count
-        role_count = len(guild.roles)
-        channel_count = len(guild.channels)
-
-        embed = discord.Embed(title="📊 サーバー情報", color=0x00AE86)
-        embed.add_field(name="メンバー数", value=f"{human_count}人+{bot_count}Bot", inline=True)
-        embed.add_field(name="ロール数", value=f"{role_count}/250個", inline=True)
-        embed.add_field(name="チャンネル数", value=f"{channel_count}/500個", inline=True)
-        embed.timestamp = discord.utils.utcnow()
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
 
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+# スプレッドシート取得用の共有HTTPクライアント（接続プールを全Cogで共有）
+SHEET_FETCHER = SheetFetcher()
+# 同じシートを複数のCogやギルドで使い回すための共有キャッシュ
+SHEET_CACHE = SheetCache(SHEET_FETCHER)
+# 通知・リマインドの送信キュー（送信先ごとにまとめて、レート制限に合わせて送る）
+OUTBOX = Outbox()
 
 @bot.event
 async def setup_hook():
+    started = time.perf_counter()
+    await bot.add_cog(StatsCog(bot))
+    await bot.add_cog(GuildConfigCog(bot, CONFIG))
     await bot.add_cog(ArchiveCog(bot))
-    await bot.add_cog(SpreadsheetCheckerCog(bot, CONFIG))
-    await bot.add_cog(FormWatcherCog(bot, CONFIG))
+    await bot.add_cog(SpreadsheetCheckerCog(bot, CONFIG, SHEET_CACHE, OUTBOX))
+    await bot.add_cog(FormWatcherCog(bot, CONFIG, SHEET_CACHE, OUTBOX))
     await bot.add_cog(BlogUploaderCog(bot))
-    await bot.add_cog(RemindCog(bot))
+    await bot.add_cog(RemindCog(bot, CONFIG, OUTBOX))
+    STARTUP_TIMINGS["cogs"] = time.perf_counter() - started
+
+    started = time.perf_counter()
     try:
-        await bot.tree.sync()
-        print("スラッシュコマンドをグローバルに同期しました。")
+        synced = await sync_if_changed(bot.tree, guild_id=COMMAND_SYNC_GUILD, force=FORCE_COMMAND_SYNC)
+        scope = f"ギルド {COMMAND_SYNC_GUILD}" if COMMAND_SYNC_GUILD else "グローバル"
+        if synced:
+            print(f"スラッシュコマンドを{scope}に同期しました。")
+        else:
+            print(f"スラッシュコマンドに変更が無いため{scope}の同期を省略しました。")
     except Exception as e:
         print(f"コマンド同期中にエラーが発生しました: {str(e)}")
+    STARTUP_TIMINGS["sync"] = time.perf_counter() - started
+    STARTUP_TIMINGS["_login_started"] = time.perf_counter()
 
 @bot.event
 async def on_ready():
     print(f"ログインしました: {bot.user}")
     for command in bot.tree.get_commands():
         print(f"登録されたコマンド: {command.name}")
-
-if TOKEN is None:
-    print("トークンが見つかりません！.envファイルを確認してください。")
-else:
-    bot.run(TOKEN)
+    login_started = STARTUP_TIMINGS.pop("_login_started", None)
+    if login_started is not None:
+        STARTUP_TIMINGS["login"] = time.perf_counter() - login_started
+        print("起動時間: " + ", ".join(f"{phase} {seconds:.2f}秒" for phase, seconds in STARTUP_TIMINGS.items()))
+
+async def main():
+    discord.utils.setup_logging()
+    install_rate_limit_counter()
+    async with bot:
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await OUTBOX.close()
+            await SHEET_FETCHER.close()
+
+# 画像圧縮のワーカープロセス（spawn）がこのファイルを読み込んでもBotを起動しないようにする
+if __name__ == "__main__":
+    if TOKEN is None:
+        print("トークンが見つかりません！.envファイルを確認してください。")
+    else:
+        asyncio.run(main())
@@ -0,0 +1,68 @@
+import heapq
+from datetime import datetime, time, timedelta
+
+DEFAULT_CHECK_TIMES = ["16:30"]
+
+
+def parse_times(values):
+    """
+    ["16:30", "18:00"] → [time(16, 30), time(18, 0)]。形式が不正なものは警告して除く。
+    リストでも文字列でもない値（1630 など）は警告して既定の時刻にする。
+    """
+    if isinstance(values, str):
+        values = [values]
+    elif not isinstance(values, (list, tuple)):
+        print(f"⚠️ チェック時刻はリストで指定してください: {values!r}（例: [\"16:30\"]）。既定の {', '.join(DEFAULT_CHECK_TIMES)} にします")
+        values = DEFAULT_CHECK_TIMES
+    times = set()
+    for value in values:
+        try:
+            times.add(datetime.strptime(value.strip(), "%H:%M").time())
+        except (AttributeError, ValueError):
+            print(f"⚠️ チェック時刻の形式が正しくありません: {value!r}（例: \"16:30\"）")
+    return sorted(times)
+
+
+class DailySchedule:
+    """
+    ギルドごとの毎日のチェック時刻を、次に来る順に並べた優先度付きキュー。
+    (予定時刻, guild_id, 時刻) を持ち、取り出したものは翌日の同じ時刻で入れ直す。
+    """
+
+    def __init__(self, tz):
+        self.tz = tz
+        self.times = {}  # {guild_id: [time, ...]}
+        self._heap = []
+
+    def _next_occurrence(self, at: time, now: datetime):
+        day = now.date()
+        due = self.tz.localize(datetime.combine(day, at))
+        if due <= now:
+            due = self.tz.localize(datetime.combine(day + timedelta(days=1), at))
+        return due
+
+    def load(self, times_by_guild, now):
+        """
+        {guild_id: [time, ...]} から組み直す。now より後の最初の予定から始める（過ぎた分はやり直さない）。
+        """
+        self.times = {guild_id: list(times) for guild_id, times in times_by_guild.items() if times}
+        self._heap = [
+            (self._next_occurrence(at, now), guild_id, at)
+            for guild_id, times in self.times.items()
+            for at in times
+        ]
+        heapq.heapify(self._heap)
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """
+        予定時刻を過ぎたギルドIDをまとめて返し、それぞれ次の予定を入れ直す。
+        """
+        due_guilds = set()
+        while self._heap and self._heap[0][0] <= now:
+            due, guild_id, at = heapq.heappop(self._heap)
+            due_guilds.add(guild_id)
+            heapq.heappush(self._heap, (self._next_occurrence(at, max(due, now)), guild_id, at))
+        return due_guilds
@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+
+import discord
+
+from atomic_file import write_json_atomic
+
+TREE_HASH_PATH = "command_tree_hash.json"
+
+
+def tree_fingerprint(tree, guild=None):
+    """
+    コマンドツリー（名前・説明・引数など、Discordに送る内容そのもの）のハッシュ。
+    """
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_hashes(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_hashes(path, hashes):
+    write_json_atomic(path, hashes, indent=2)
+
+
+async def sync_if_changed(tree, guild_id=None, force=False, path=TREE_HASH_PATH):
+    """
+    前回同期したツリーと内容が変わっている場合だけ tree.sync() を呼ぶ。
+    guild_id を指定するとグローバルコマンドをそのギルドにコピーしてギルド単位で同期する（開発用・即時反映）。
+    同期した場合は True を返す。
+    """
+    guild = discord.Object(id=guild_id) if guild_id else None
+    if guild is not None:
+        tree.copy_global_to(guild=guild)
+    # 別のBotトークンで起動した場合に前回の記録を流用しないよう、アプリIDも鍵に含める
+    scope = f"{tree.client.application_id}:" + (f"guild:{guild_id}" if guild_id else "global")
+
+    fingerprint = tree_fingerprint(tree, guild=guild)
+    hashes = _load_hashes(path)
+    if not force and hashes.get(scope) == fingerprint:
+        return False
+
+    await tree.sync(guild=guild)
+    hashes[scope] = fingerprint
+    _save_hashes(path, hashes)
+    return True
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+HEADER_MARKER = "お名前"
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+
+def find_header(rows):
+    """
+    「お名前」を含む最初の行をヘッダーとして (行番号, 行) を返す。
+    rows はリストでもcsv.readerでもよい（readerの場合はヘッダーの次まで読み進める）。
+    """
+    for i, row in enumerate(rows):
+        if HEADER_MARKER in row:
+            return i, row
+    raise ValueError("ヘッダー行（お名前）が見つかりません")
+
+
+class FormSchema:
+    """
+    ヘッダー行を一度だけ解析して、列名 → 列番号を引けるようにしたもの。
+    """
+
+    __slots__ = ("headers", "offsets", "name_col", "timestamp_col", "status_col", "min_length")
+
+    def __init__(self, headers):
+        self.headers = headers
+        # 同じ列名が複数ある場合は list.index と同じく最初の列を使う
+        self.offsets = {}
+        for i, col in enumerate(headers):
+            self.offsets.setdefault(col, i)
+        self.name_col = self.offsets["お名前"]
+        self.timestamp_col = self.offsets["タイムスタンプ"]
+        self.status_col = self.offsets["出退勤"]
+        self.min_length = max(self.name_col, self.timestamp_col, self.status_col) + 1
+
+    def record(self, row):
+        """
+        CSVの1行を FormRecord にする。必須列が足りない行は None。
+        """
+        if len(row) < self.min_length:
+            return None
+        return FormRecord(self, row)
+
+
+class FormRecord:
+    """
+    フォーム回答1件。よく使う列とタイムスタンプは作成時に取り出しておく。
+    """
+
+    __slots__ = ("schema", "row", "name", "status", "timestamp_str", "timestamp", "date")
+
+    def __init__(self, schema, row):
+        self.schema = schema
+        self.row = row
+        self.name = row[schema.name_col].strip()
+        self.status = row[schema.status_col].strip()
+        self.timestamp_str = row[schema.timestamp_col].strip()
+        try:
+            self.timestamp = datetime.strptime(self.timestamp_str, TIMESTAMP_FORMAT)
+        except ValueError:
+            self.timestamp = None
+        self.date = self.timestamp.date() if self.timestamp else None
+
+    def get(self, col):
+        i = self.schema.offsets.get(col)
+        if i is None or i >= len(self.row):
+            return ""
+        return self.row[i].strip()
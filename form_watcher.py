@@ -1,176 +1,400 @@
 import discord
 from discord.ext import commands, tasks
+from discord import app_commands
 from datetime import datetime, timedelta, time
 import pytz
-import csv
-import requests
-from io import StringIO
-import re
-import json
+import asyncio
+from form_watermark import WatermarkStore, iter_form_rows
+from sent_store import SentEntryStore
+from routing import RouteIndex, normalize_name
+from form_schema import FormSchema, find_header
+from metrics import REGISTRY
+from attendance import AttendanceStore
+from sheet_query import FETCH_MODE_QUERY, form_query_url
 
-SENT_LOG_PATH = "sent_entries.json"
+# 退勤報告の評価項目（列名 → 表示ラベル）
+RATING_LABELS = {
+    "目標通りの作業ができた": "目標通りの作業",
+    "順調に作業がすすめられた": "順調に作業を進める",
+    "間違いに気づき、直すことができた": "間違い発見と修正",
+    "作業準備・整理整頓ができた": "作業準備・整理整頓",
+    "必要に応じた報告・連絡・相談ができた": "報告・連絡・相談",
+    "集中して取り組むことができた": "集中して作業",
+    "楽しい時間を過ごすことができた": "楽しく過ごせた"
+}
 
 class FormWatcherCog(commands.Cog):
-    def __init__(self, bot, config):
+    def __init__(self, bot, config, sheet_cache, outbox):
         self.bot = bot
         self.config = config
+        self.sheets = sheet_cache
+        self.outbox = outbox
         self.tz = pytz.timezone("Asia/Tokyo")
-        self.notified_entries = self.load_sent_entries()
-        self.missing_retire_alert_sent = False
+        self.notified_entries = SentEntryStore()
+        self.notified_entries.load(datetime.now(self.tz).strftime("%Y/%m/%d"))
+        # 送信キューに積んだがまだ届いていない通知（同じ回答を二重に積まない）
+        self.pending_entries = set()
+        # ギルドごとに、退勤漏れを通知済みの日付 {guild_id: date}（同じ日の分を二重に通知しない）
+        self.missing_retire_alerted = {}
+        # ギルドごとの前回シート内容のハッシュと、変化あり/なしのポーリング回数
+        self.last_sheet_digest = {}
+        # 絞り込み取得（sheet_fetch_mode="query"）で使った当日のURL・処理済みの位置と、失敗して全件取得に戻したギルド
+        self._query_urls = {}
+        self._query_marks = {}
+        self._query_retry = {}
+        self._query_failed = set()
+        self.watermarks = WatermarkStore()
+        # ウォーターマークより前で、送信先が無い等でまだ通知できていない行の番号 {guild_id: set}
+        self.retry_rows = {}
+        self._form_locks = {}
+        # 回答の流れから作る出退勤の状態（深夜の退勤漏れチェックと /出勤状況 で使う）
+        self.attendance = AttendanceStore()
+        # 人名 → 「今日のお仕事」送信先の索引
+        self.routes = RouteIndex()
         print("✅ FormWatcherCog 起動完了！チェック有効化！")
         self.check_form_responses.start()
         self.check_missing_retire.start()
+        self.compact_sent_entries.start()
 
     def cog_unload(self):
         self.check_form_responses.cancel()
         self.check_missing_retire.cancel()
+        self.compact_sent_entries.cancel()
 
-    def load_sent_entries(self):
-        try:
-            with open(SENT_LOG_PATH, "r", encoding="utf-8") as f:
-                return set(json.load(f))
-        except FileNotFoundError:
-            return set()
+    def save_sent_entry(self, date_str, guild_id, entry_key):
+        self.notified_entries.add(date_str, guild_id, entry_key)
 
-    def save_sent_entry(self, entry_key):
-        self.notified_entries.add(entry_key)
-        with open(SENT_LOG_PATH, "w", encoding="utf-8") as f:
-            json.dump(list(self.notified_entries), f, ensure_ascii=False, indent=2)
+    @tasks.loop(hours=6)
+    async def compact_sent_entries(self):
+        # 古い日付の通知済みキーをバックグラウンドで捨てる
+        today_str = datetime.now(self.tz).strftime("%Y/%m/%d")
+        try:
+            with REGISTRY.timer("loop_duration_seconds", cog="form_watcher", loop="compact_sent_entries"):
+                await asyncio.to_thread(self.notified_entries.compact, today_str)
+                self.attendance.prune(today_str)
+                self.attendance.save()
+        except Exception as e:
+            print(f"通知済みログの整理でエラーが発生しました: {e}")
 
     @tasks.loop(minutes=1)
     async def check_form_responses(self):
-        for guild in self.bot.guilds:
-            cfg = self.config.get(str(guild.id))
-            if not cfg:
-                continue
+        # ギルドごとの取得・通知を並行して実行する
+        with REGISTRY.timer("loop_duration_seconds", cog="form_watcher", loop="check_form_responses"):
+            await asyncio.gather(*(self.check_guild_form(guild) for guild in self.bot.guilds))
 
+    async def check_guild_form(self, guild):
+        cfg = self.config.get(str(guild.id))
+        if not cfg:
+            return
+
+        # 毎分のループと深夜の退勤漏れチェックが同じギルドを同時に処理しないようにする
+        async with self._form_locks.setdefault(guild.id, asyncio.Lock()):
+            with REGISTRY.timer("guild_check_seconds", cog="form_watcher", guild=guild.id):
+                await self._check_guild_form(guild, cfg)
+
+    async def _check_guild_form(self, guild, cfg):
+        try:
+            form_time_str = cfg.get("check_from_form_time")
+            url = cfg.get("syuttaikinn_url")
+            if not form_time_str or not url:
+                return  # 必要な設定が無い場合スキップ
+
+            CHECK_FROM_TIME = datetime.strptime(form_time_str, "%Y/%m/%d %H:%M:%S")
+            if cfg.get("sheet_fetch_mode") == FETCH_MODE_QUERY:
+                if await self.check_guild_form_query(guild, cfg, url, CHECK_FROM_TIME):
+                    return
+            with REGISTRY.timer("sheet_get_seconds", cog="form_watcher", guild=guild.id):
+                response = await self.sheets.get(url, cog="form_watcher", guild=guild.id)
+            mark = self.watermarks.get(guild.id)
+            retry = self.retry_rows.get(guild.id)
+            if retry is None:
+                retry = self.retry_rows[guild.id] = set((mark or {}).get("retry", ()))
+            if self.last_sheet_digest.get(guild.id) == response.digest and not retry:
+                # 前回から変化なし → デコード・CSV解析・行ループを丸ごと省略
+                REGISTRY.inc("form_polls_total", cog="form_watcher", guild=guild.id, result="unchanged")
+                self.attendance.touch(guild.id, datetime.now(self.tz))
+                return
+            REGISTRY.inc("form_polls_total", cog="form_watcher", guild=guild.id, result="changed")
+
+            # 前回処理した行より後ろと、通知できていない行だけを読む（ヘッダーが動いた場合は全件再走査）
+            row_iter = iter_form_rows(response.body, mark, retry=retry)
+            header_row_index, headers, last_row_number = next(row_iter)
+            if last_row_number == 0:
+                retry.clear()
+            schema = FormSchema(headers)
+            now = datetime.now(self.tz)
+            today = now.date()
+            self.attendance.start_feed(guild.id, full_scan=last_row_number == 0, now=now)
+            last_timestamp = (mark or {}).get("timestamp", "") if last_row_number else ""
+
+            parsed = 0
             try:
-                form_time_str = cfg.get("check_from_form_time")
-                url = cfg.get("syuttaikinn_url")
-                if not form_time_str or not url:
-                    continue  # 必要な設定が無い場合スキップ
-
-                CHECK_FROM_TIME = datetime.strptime(form_time_str, "%Y/%m/%d %H:%M:%S")
-                response = requests.get(url)
-                response.raise_for_status()
-                content = response.content.decode("utf-8-sig")
-                reader = csv.reader(StringIO(content))
-                rows = list(reader)
-
-                header_row_index = next(i for i, row in enumerate(rows) if "お名前" in row)
-                headers = rows[header_row_index]
-                name_col = headers.index("お名前")
-                timestamp_col = headers.index("タイムスタンプ")
-                status_col = headers.index("出退勤")
-                new_rows = rows[header_row_index + 1:]
-                today_str = datetime.now(self.tz).strftime("%Y/%m/%d")
-
-                for row in new_rows:
-                    if len(row) <= max(name_col, timestamp_col, status_col):
-                        continue
-                    if row[name_col].strip() == "" or today_str not in row[timestamp_col]:
-                        continue
-
-                    timestamp_str = row[timestamp_col].strip()
-                    try:
-                        timestamp_obj = datetime.strptime(timestamp_str, "%Y/%m/%d %H:%M:%S")
-                        if timestamp_obj < CHECK_FROM_TIME:
-                            continue
-                    except:
-                        continue
-
-                    raw_name = row[name_col].strip()
-                    normalized_name = self.normalize_name(raw_name)
-                    status = row[status_col].strip()
-                    entry_key = f"{raw_name}|{status}"
-
-                    if entry_key in self.notified_entries:
-                        continue
-
-                    embed = self.create_embed(raw_name, status, timestamp_str, headers, row)
-                    if embed is None:
-                        continue
-
-                    sent = await self.send_to_discord(guild, normalized_name, embed, status, cfg)
-                    if sent:
-                        self.save_sent_entry(entry_key)
-
-            except Exception as e:
-                print(f"フォーム通知処理でエラーが発生しました: {e}")
+                for row_number, row in row_iter:
+                    parsed += 1
+                    record = schema.record(row)
+                    if record is not None and record.name:
+                        self.attendance.record(guild.id, self.normalize_name(record.name), record)
+                    await self.process_form_row(guild, cfg, record, today, CHECK_FROM_TIME, retry, row_number)
+                    if row_number > last_row_number:
+                        last_row_number = row_number
+                        last_timestamp = row[schema.timestamp_col].strip() if len(row) > schema.timestamp_col else ""
+            finally:
+                REGISTRY.inc("rows_parsed_total", parsed, cog="form_watcher", guild=guild.id)
+                # 途中で失敗しても、処理できた行までは記録しておく
+                self.watermarks.update(guild.id, header_row_index, headers, last_row_number, last_timestamp, retry)
+                self.watermarks.save()
+                self.attendance.touch(guild.id, now)
+                self.attendance.save()
+
+            # 全行を処理し終えてから記録する（途中で失敗したら次回もう一度処理する）
+            self.last_sheet_digest[guild.id] = response.digest
+
+        except Exception as e:
+            print(f"フォーム通知処理でエラーが発生しました: {e}")
+
+    async def check_guild_form_query(self, guild, cfg, url, check_from_time):
+        """
+        タイムスタンプが今日の行だけを gviz/tq で取得して処理する。
+        型の混ざった回答の列は空欄で返るため、そういうフォームでは使わない（sheet_query を参照）。
+        問い合わせに失敗した場合は False を返し、呼び出し元が全件取得で処理する。
+        """
+        now = datetime.now(self.tz)
+        today = now.date()
+        query_url = form_query_url(url, today, cfg.get("form_timestamp_column", "A"))
+        # 当日の結果は追記されるだけなので、ウォーターマークと同じ方法で処理済みの行を読み飛ばす（メモリ上のみ）
+        if self._query_urls.get(guild.id) == query_url:
+            mark = self._query_marks.get(guild.id)
+            retry = self._query_retry.setdefault(guild.id, set())
+        else:
+            mark = None
+            retry = self._query_retry[guild.id] = set()
+        try:
+            with REGISTRY.timer("sheet_get_seconds", cog="form_watcher", guild=guild.id):
+                response = await self.sheets.get(query_url, cog="form_watcher", guild=guild.id)
+            row_iter = iter_form_rows(response.body, mark, retry=retry)
+            header_row_index, headers, last_row_number = next(row_iter)
+            if last_row_number == 0:
+                retry.clear()
+            schema = FormSchema(headers)
+        except Exception as e:
+            if guild.id not in self._query_failed:
+                print(f"⚠️ 絞り込み取得に失敗したため全件取得で確認します（{guild.name}）: {e}")
+                self._query_failed.add(guild.id)
+            return False
+        self._query_failed.discard(guild.id)
+
+        # 日付が変わったら前日の問い合わせ結果は使わないので手放す
+        previous = self._query_urls.get(guild.id)
+        if previous is not None and previous != query_url:
+            self.sheets.invalidate(previous)
+            # 前日の最後の確認から0時までの回答は取得していないので、前日分は揃っていない扱いにする
+            self.attendance.restart_feed(guild.id, self.tz.localize(datetime.combine(today, time())))
+        self._query_urls[guild.id] = query_url
+
+        if self.last_sheet_digest.get(guild.id) == response.digest and not retry:
+            REGISTRY.inc("form_polls_total", cog="form_watcher", guild=guild.id, result="unchanged")
+            self.attendance.touch(guild.id, now)
+            return True
+        REGISTRY.inc("form_polls_total", cog="form_watcher", guild=guild.id, result="changed")
+
+        # 今日の行は全部届いているので、出退勤の状態は今日の0時から揃っている
+        midnight = self.tz.localize(datetime.combine(today, time()))
+        self.attendance.start_feed(guild.id, full_scan=False, now=midnight)
+        last_timestamp = mark.get("timestamp", "") if mark and last_row_number else ""
+        parsed = 0
+        try:
+            for row_number, row in row_iter:
+                parsed += 1
+                record = schema.record(row)
+                if record is not None and record.name:
+                    self.attendance.record(guild.id, self.normalize_name(record.name), record)
+                await self.process_form_row(guild, cfg, record, today, check_from_time, retry, row_number)
+                if row_number > last_row_number:
+                    last_row_number = row_number
+                    last_timestamp = row[schema.timestamp_col].strip() if len(row) > schema.timestamp_col else ""
+        finally:
+            REGISTRY.inc("rows_parsed_total", parsed, cog="form_watcher", guild=guild.id)
+            self._query_marks[guild.id] = {
+                "header_index": header_row_index,
+                "header": headers,
+                "row": last_row_number,
+                "timestamp": last_timestamp,
+            }
+            self.attendance.touch(guild.id, now)
+            self.attendance.save()
+
+        self.last_sheet_digest[guild.id] = response.digest
+        return True
+
+    async def process_form_row(self, guild, cfg, record, today, check_from_time, retry, row_number):
+        """
+        1行分の通知を送信キューに積む。送信先が見つからなかった行・届かなかった行は retry に入れ、
+        次のポーリングで処理し直す。
+        """
+        retry.discard(row_number)
+        if record is None or record.name == "" or record.date != today:
+            return
+        if record.timestamp < check_from_time:
+            return
+
+        normalized_name = self.normalize_name(record.name)
+        today_str = today.strftime("%Y/%m/%d")
+        entry_key = f"{record.name}|{record.status}"
+
+        # 別のギルドに同じ名前の人がいても混ざらないよう、ギルドごとに数える
+        sent_key = (today_str, guild.id, entry_key)
+        if sent_key in self.notified_entries or sent_key in self.pending_entries:
+            return
+
+        embed = self.create_embed(record)
+        if embed is None:
+            return
+
+        delivery = self.send_to_discord(guild, normalized_name, embed, record.status, cfg)
+        if delivery is None:
+            # 「今日のお仕事」がまだ無い → 作られたら送る
+            retry.add(row_number)
+        else:
+            self.pending_entries.add(sent_key)
+            delivery.add_done_callback(
+                lambda future: self.entry_delivered(sent_key, future.result(), retry, row_number))
+
+    def entry_delivered(self, sent_key, delivered, retry, row_number):
+        # 届いたものだけ通知済みにする。再送しても届かなかったものは retry に戻し、次のポーリングで積み直す
+        self.pending_entries.discard(sent_key)
+        if delivered:
+            self.save_sent_entry(*sent_key)
+        else:
+            retry.add(row_number)
 
     @tasks.loop(time=time(hour=0))
     async def check_missing_retire(self):
-        if self.missing_retire_alert_sent:
+        yesterday = (datetime.now(self.tz) - timedelta(days=1)).date()
+        guilds = [guild for guild in self.bot.guilds if self.missing_retire_alerted.get(guild.id) != yesterday]
+        with REGISTRY.timer("loop_duration_seconds", cog="form_watcher", loop="check_missing_retire"):
+            await asyncio.gather(*(self.check_guild_missing_retire(guild, yesterday) for guild in guilds))
+
+    async def check_guild_missing_retire(self, guild, yesterday):
+        cfg = self.config.get(str(guild.id))
+        if not cfg or not cfg.get("syuttaikinn_url"):
             return
-        for guild in self.bot.guilds:
-            cfg = self.config.get(str(guild.id))
-            if not cfg or not cfg.get("syuttaikinn_url"):
+        try:
+            if not self.attendance.covers(guild.id, yesterday):
+                # 0時を過ぎてからまだ確認していなければ、先に一度確認して状態を最新にする
+                await self.check_guild_form(guild)
+            if self.attendance.covers(guild.id, yesterday):
+                # 日中に受け取った回答から分かるので、シートを取り直さない
+                missing = self.attendance.missing_retire(guild.id, yesterday)
+            else:
+                missing = await self.fetch_missing_retire(guild, cfg, yesterday)
+
+            if missing:
+                channel = cfg.text_channel(guild, "mitaikin_alert_ch_name")
+                names = "\n".join(f"・{name}" for name in missing)
+                message = f"{cfg.role_mention(guild)}\n昨日出勤して退勤していない可能性がある人のリスト:\n{names}"
+                self.outbox.send(channel, message, cog="form_watcher", guild=guild.id)
+                self.missing_retire_alerted[guild.id] = yesterday
+        except Exception as e:
+            print(f"退勤漏れチェックエラー: {e}")
+
+    async def fetch_missing_retire(self, guild, cfg, yesterday):
+        # 前日の回答を最初から受け取れていない場合（初回起動など）はシートから数える
+        with REGISTRY.timer("sheet_get_seconds", cog="form_watcher", guild=guild.id):
+            rows = await self.sheets.get_rows(cfg["syuttaikinn_url"], cog="form_watcher", guild=guild.id)
+        REGISTRY.inc("rows_parsed_total", len(rows), cog="form_watcher", guild=guild.id)
+
+        header_row_index, headers = find_header(rows)
+        schema = FormSchema(headers)
+        checked = {}
+
+        for row in rows[header_row_index + 1:]:
+            record = schema.record(row)
+            if record is None or record.date != yesterday:
                 continue
-            try:
-                response = requests.get(cfg["syuttaikinn_url"])
-                response.raise_for_status()
-                content = response.content.decode("utf-8-sig")
-                reader = csv.reader(StringIO(content))
-                rows = list(reader)
-
-                header_row_index = next(i for i, row in enumerate(rows) if "お名前" in row)
-                headers = rows[header_row_index]
-                name_col = headers.index("お名前")
-                timestamp_col = headers.index("タイムスタンプ")
-                status_col = headers.index("出退勤")
-                data = rows[header_row_index + 1:]
-
-                yesterday = (datetime.now(self.tz) - timedelta(days=1)).strftime("%Y/%m/%d")
-                checked = {}
-
-                for row in data:
-                    if len(row) <= max(name_col, timestamp_col, status_col):
-                        continue
-                    if yesterday not in row[timestamp_col]:
-                        continue
-                    name = self.normalize_name(row[name_col].strip())
-                    status = row[status_col].strip()
-                    checked.setdefault(name, set()).add(status)
-
-                missing = [name for name, statuses in checked.items() if "出勤" in statuses and "退勤" not in statuses]
-
-                if missing:
-                    channel = discord.utils.get(guild.text_channels, name=cfg["mitaikin_alert_ch_name"])
-                    role = discord.utils.get(guild.roles, name=cfg["role_name"])
-                    role_mention = role.mention if role else "@here"
-                    names = "\n".join(f"・{name}" for name in missing)
-                    message = f"{role_mention}\n昨日出勤して退勤していない可能性がある人のリスト:\n{names}"
-                    await channel.send(message)
-                    self.missing_retire_alert_sent = True
-            except Exception as e:
-                print(f"退勤漏れチェックエラー: {e}")
-
-    async def send_to_discord(self, guild, normalized_name, embed, status, cfg):
-        for category in guild.categories:
-            if self.normalize_name(category.name) == normalized_name:
-                text_channel = discord.utils.get(category.channels, name="今日のお仕事")
-                if isinstance(text_channel, discord.TextChannel):
-                    await text_channel.send(embed=embed)
-                    if status == "出勤":
-                        await text_channel.send(f"SNS広報をお願いします！\n{cfg['SNS_LINK']}")
-                    return True
-        for channel in guild.channels:
-            if isinstance(channel, discord.ForumChannel) and self.normalize_name(channel.name) == normalized_name:
-                for thread in channel.threads:
-                    if thread.name == "今日のお仕事":
-                        await thread.send(embed=embed)
-                        if status == "出勤":
-                            await thread.send(f"SNS広報\n{cfg['SNS_LINK']}")
-                        return True
-        return False
-
-    def create_embed(self, raw_name, status, timestamp_str, headers, row):
+            name = self.normalize_name(record.name)
+            checked.setdefault(name, set()).add(record.status)
+
+        return [name for name, statuses in checked.items() if "出勤" in statuses and "退勤" not in statuses]
+
+    @app_commands.command(name="出勤状況", description="今出勤中の人を表示します")
+    @app_commands.guild_only()
+    async def attendance_status(self, interaction: discord.Interaction):
+        today = datetime.now(self.tz).date()
+        present = sorted(self.attendance.present(interaction.guild_id, today), key=lambda entry: entry["in"])
+        updated_at = self.attendance.updated_at(interaction.guild_id)
+        footer = f"\n（フォーム回答の確認: {updated_at}）" if updated_at else ""
+
+        if not present:
+            await interaction.response.send_message(f"🏠 今出勤中の人はいません。{footer}", ephemeral=True)
+            return
+
+        lines = []
+        for count, entry in enumerate(present):
+            line = f"・{entry['name']}（{entry['in'][-8:-3]} 出勤）"
+            if sum(len(l) + 1 for l in lines) + len(line) > 1800:
+                lines.append(f"…ほか{len(present) - count}人")
+                break
+            lines.append(line)
+        names = "\n".join(lines)
+        await interaction.response.send_message(f"🏢 今出勤中の人（{len(present)}人）:\n{names}{footer}", ephemeral=True)
+
+    def send_to_discord(self, guild, normalized_name, embed, status, cfg):
+        """
+        送信キューに積み、埋め込みが届いたかどうかの Future を返す（送信先が無ければ None）。
+        出勤の場合の「SNS広報」は続けて積むので、埋め込みと同じ1通で送られる。
+        """
+        destination = self.routes.lookup(guild, normalized_name)
+        if destination is None:
+            return None
+        delivery = self.outbox.send(destination, embed=embed, cog="form_watcher", guild=guild.id)
+        if status == "出勤":
+            if isinstance(destination, discord.Thread):
+                self.outbox.send(destination, f"SNS広報\n{cfg['SNS_LINK']}", cog="form_watcher", guild=guild.id)
+            else:
+                self.outbox.send(destination, f"SNS広報をお願いします！\n{cfg['SNS_LINK']}", cog="form_watcher", guild=guild.id)
+        return delivery
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        self.routes.build(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.routes.build(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.routes.on_channel_changed(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        if getattr(before, "category_id", None) != getattr(after, "category_id", None) and before.category is not None:
+            self.routes.index_category(before.category)
+        self.routes.on_channel_changed(after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.routes.on_channel_changed(channel, deleted=True)
+
+    @commands.Cog.listener()
+    async def on_thread_create(self, thread):
+        self.routes.on_thread_changed(thread)
+
+    @commands.Cog.listener()
+    async def on_thread_update(self, before, after):
+        self.routes.on_thread_changed(after)
+
+    @commands.Cog.listener()
+    async def on_thread_delete(self, thread):
+        self.routes.on_thread_changed(thread)
+
+    def create_embed(self, record):
+        raw_name, status, timestamp_str = record.name, record.status, record.timestamp_str
+        get = record.get
         embed = discord.Embed(color=0x1E90FF if status == "出勤" else 0x32CD32)
         embed.title = f"{'🔵 出勤連絡' if status == '出勤' else '🟢 退勤報告'} - {raw_name}"
         embed.set_footer(text=timestamp_str)
 
-        def get(col): return row[headers.index(col)].strip() if col in headers else ""
-
         if status == "出勤":
             temp, cond = get("体温"), get("体調")
             if temp or cond:
@@ -191,17 +415,8 @@ class FormWatcherCog(commands.Cog):
             if get("特記事項"):
                 embed.add_field(name="特記事項", value=get("特記事項"), inline=False)
 
-            label_map = {
-                "目標通りの作業ができた": "目標通りの作業",
-                "順調に作業がすすめられた": "順調に作業を進める",
-                "間違いに気づき、直すことができた": "間違い発見と修正",
-                "作業準備・整理整頓ができた": "作業準備・整理整頓",
-                "必要に応じた報告・連絡・相談ができた": "報告・連絡・相談",
-                "集中して取り組むことができた": "集中して作業",
-                "楽しい時間を過ごすことができた": "楽しく過ごせた"
-            }
             ratings = []
-            for col, label in label_map.items():
+            for col, label in RATING_LABELS.items():
                 val = get(col)
                 if val:
                     ratings.append(f"{val} | {label}")
@@ -213,13 +428,8 @@ class FormWatcherCog(commands.Cog):
     @check_form_responses.before_loop
     async def before_check_form_responses(self):
         await self.bot.wait_until_ready()
+        for guild in self.bot.guilds:
+            self.routes.build(guild)
 
     def normalize_name(self, name):
-        name = re.sub(r"[\s　]", "", name.strip())
-        variants = {
-            "髙": "高",
-            "𠮷": "吉",
-        }
-        for old, new in variants.items():
-            name = name.replace(old, new)
-        return name
+        return normalize_name(name)
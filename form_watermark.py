@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import os
+from atomic_file import write_json_atomic
+from form_schema import find_header
+
+WATERMARK_PATH = "form_watermark.json"
+
+
+class WatermarkStore:
+    """
+    ギルドごとに「どこまでフォーム回答を処理したか」を保存する。
+    {guild_id: {"header_index": int, "header": [...], "row": int, "timestamp": str, "retry": [int, ...]}}
+    row はヘッダー行より後ろで処理済みのデータ行数。
+    retry は row より前で、送信先が無い等でまだ通知できていない行の番号（次回も読み直す）。
+    """
+
+    def __init__(self, path: str = WATERMARK_PATH):
+        self.path = path
+        self.marks = self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ ウォーターマークの読み込みに失敗しました（全件再走査します）: {e}")
+        return {}
+
+    def save(self):
+        write_json_atomic(self.path, self.marks, ensure_ascii=False)
+
+    def get(self, guild_id):
+        return self.marks.get(str(guild_id))
+
+    def update(self, guild_id, header_index, header, row, timestamp, retry=()):
+        self.marks[str(guild_id)] = {
+            "header_index": header_index,
+            "header": header,
+            "row": row,
+            "timestamp": timestamp,
+            "retry": sorted(retry),
+        }
+
+
+def _open_reader(body: bytes):
+    # 本文全体をデコードせず、読み進めた分だけデコードする
+    return csv.reader(io.TextIOWrapper(io.BytesIO(body), encoding="utf-8-sig", newline=""))
+
+
+def iter_form_rows(body: bytes, mark=None, timestamp_col_name="タイムスタンプ", retry=()):
+    """
+    CSV本文を1行ずつ読み、ウォーターマークより後ろの行だけを返すジェネレーター。
+    最初に (header_index, headers, start_row) を返し、以降は (row_number, row) を返す。
+    読み飛ばした部分のうち retry の番号の行は、後ろの行より先に返す。
+    ヘッダー行の位置・内容が変わっていた場合や、処理済みの最終行のタイムスタンプが
+    一致しない場合（行の削除・並べ替え）は start_row=0 として全件を返す。
+    """
+    reader = _open_reader(body)
+    header_index, headers = find_header(reader)
+
+    start_row = 0
+    retried = []
+    if mark and mark.get("header_index") == header_index and mark.get("header") == headers and mark.get("row", 0) > 0:
+        # 既知の先頭部分は中身を評価せずに読み飛ばす
+        target = mark["row"]
+        timestamp_col = headers.index(timestamp_col_name)
+        last_row = None
+        for row_number, row in enumerate(reader, 1):
+            if row_number in retry:
+                retried.append((row_number, row))
+            if row_number == target:
+                last_row = row
+                break
+        last_timestamp = last_row[timestamp_col].strip() if last_row is not None and len(last_row) > timestamp_col else None
+        if last_timestamp == mark.get("timestamp"):
+            start_row = target
+        else:
+            # 先頭部分が変わっている → 最初から読み直す
+            retried = []
+            reader = _open_reader(body)
+            find_header(reader)
+
+    yield header_index, headers, start_row
+    yield from retried
+
+    for row_number, row in enumerate(reader, start_row + 1):
+        yield row_number, row
@@ -0,0 +1,210 @@
+import json
+import os
+
+import discord
+from discord.ext import commands, tasks
+
+CONFIG_PATH = "config.json"
+CONFIG_RELOAD_INTERVAL = 30  # 秒。この間隔で config.json の更新を確認し、変わっていれば読み直す
+
+
+class GuildConfig:
+    """
+    1ギルド分の設定（config.json の値）。dict と同じく get() / [] で読める。
+    チャンネル名・ロール名は一度探したらIDで覚えておき、以降はIDで引く。
+    """
+
+    def __init__(self, guild_id, values):
+        self.guild_id = int(guild_id)
+        self.values = values
+        # {名前: ID}（見つからなかった名前は None）
+        self._channel_ids = {}
+        self._role_ids = {}
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def text_channel(self, guild, key, default=None):
+        """
+        設定 key に書かれた名前のテキストチャンネル（無ければ None）。
+        """
+        name = self.values.get(key) or default
+        if not name:
+            return None
+        if name in self._channel_ids:
+            channel_id = self._channel_ids[name]
+            if channel_id is None:
+                return None
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                return channel
+        channel = discord.utils.get(guild.text_channels, name=name)
+        self._channel_ids[name] = channel.id if channel else None
+        return channel
+
+    def role(self, guild, key="role_name"):
+        name = self.values.get(key)
+        if not name:
+            return None
+        if name in self._role_ids:
+            role_id = self._role_ids[name]
+            if role_id is None:
+                return None
+            role = guild.get_role(role_id)
+            if role is not None:
+                return role
+        role = discord.utils.get(guild.roles, name=name)
+        self._role_ids[name] = role.id if role else None
+        return role
+
+    def role_mention(self, guild, key="role_name"):
+        role = self.role(guild, key)
+        return role.mention if role else "@here"
+
+    def forget_channel(self, channel):
+        # 作成・改名・削除されたチャンネルに関わる名前だけ、次に使う時に探し直す
+        for name, channel_id in list(self._channel_ids.items()):
+            if name == channel.name or channel_id == channel.id:
+                del self._channel_ids[name]
+
+    def forget_role(self, role):
+        for name, role_id in list(self._role_ids.items()):
+            if name == role.name or role_id == role.id:
+                del self._role_ids[name]
+
+
+class GuildConfigStore:
+    """
+    config.json をギルドIDごとの GuildConfig にしたもの。Bot全体で1つを共有する。
+    reload() で読み直すと、登録されたコールバック（チェック時刻の組み直しなど）を呼ぶ。
+    """
+
+    def __init__(self, path=CONFIG_PATH, values=None):
+        self.path = path
+        self.guilds = {}
+        self.mtime = None
+        self._listeners = []
+        if values is not None:
+            self._compile(values)
+        else:
+            self.load()
+
+    def _compile(self, values):
+        # "_comment" などギルド以外の項目は除く
+        self.guilds = {
+            str(guild_id): GuildConfig(guild_id, cfg)
+            for guild_id, cfg in values.items()
+            if isinstance(cfg, dict)
+        }
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            values = json.load(f)
+        self.mtime = os.stat(self.path).st_mtime_ns
+        self._compile(values)
+
+    def get(self, guild_id, default=None):
+        return self.guilds.get(str(guild_id), default)
+
+    def items(self):
+        return self.guilds.items()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def reload(self):
+        """
+        config.json を読み直す。読めない場合は今の設定のまま続ける。
+        """
+        try:
+            self.load()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ config.json の読み直しに失敗しました（今の設定のまま続けます）: {e}")
+            return False
+        for callback in self._listeners:
+            # 1つのコールバックの失敗で、設定の監視（watch_config）まで止めない
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ config.json の反映中にエラーが発生しました: {e}")
+        print(f"✅ config.json を読み直しました（{len(self.guilds)}ギルド）")
+        return True
+
+    def reload_if_changed(self):
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+        # 読めなかった場合も、同じ内容について何度も警告しない
+        self.mtime = mtime
+        return self.reload()
+
+    def forget_channel(self, channel):
+        cfg = self.get(channel.guild.id)
+        if cfg is not None:
+            cfg.forget_channel(channel)
+
+    def forget_role(self, role):
+        cfg = self.get(role.guild.id)
+        if cfg is not None:
+            cfg.forget_role(role)
+
+
+class GuildConfigCog(commands.Cog):
+    """
+    config.json の更新の監視と、チャンネル・ロールのイベントでの名前→IDの覚え直し。
+    """
+
+    def __init__(self, bot, store):
+        self.bot = bot
+        self.store = store
+
+    async def cog_load(self):
+        self.watch_config.start()
+
+    def cog_unload(self):
+        self.watch_config.cancel()
+
+    @tasks.loop(seconds=CONFIG_RELOAD_INTERVAL)
+    async def watch_config(self):
+        self.store.reload_if_changed()
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        self.store.forget_channel(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        self.store.forget_channel(before)
+        self.store.forget_channel(after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.store.forget_channel(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.store.forget_role(role)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        self.store.forget_role(before)
+        self.store.forget_role(after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.store.forget_role(role)
@@ -0,0 +1,103 @@
+import asyncio
+
+
+class GuildCounts:
+    __slots__ = ("members", "bots", "roles", "channels", "bots_exact")
+
+    def __init__(self, members, bots, roles, channels, bots_exact):
+        self.members = members
+        self.bots = bots
+        self.roles = roles
+        self.channels = channels
+        # チャンク未完了のギルドでBot数を数え終えるまでは False
+        self.bots_exact = bots_exact
+
+    @property
+    def humans(self):
+        return max(0, self.members - self.bots)
+
+
+class GuildCounters:
+    """
+    /server 用のギルドごとの人数・Bot数・ロール数・チャンネル数。
+    ギルドの準備ができた時に一度だけ数え、以降はイベントで増減させる。
+    チャンクしていないギルドのBot数は、最初の /server の時にだけメンバー一覧APIで数える（再接続では数え直さない）。
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._seeding = {}
+
+    def get(self, guild_id):
+        return self.counts.get(guild_id)
+
+    def seed(self, guild):
+        # member_count はチャンクしていなくてもゲートウェイから届く正確な値。
+        # Bot数はチャンク済みならキャッシュから、未完了なら暫定値にして count_bots() で数える
+        counts = self.counts.get(guild.id)
+        if counts is not None:
+            # 再接続（on_guild_available）では、ゲートウェイから届く値だけ取り直す
+            counts.members = guild.member_count or counts.members
+            counts.roles = len(guild.roles)
+            counts.channels = len(guild.channels)
+            if guild.chunked and not counts.bots_exact:
+                counts.bots = sum(1 for member in guild.members if member.bot)
+                counts.bots_exact = True
+            return
+        self.counts[guild.id] = GuildCounts(
+            members=guild.member_count or 0,
+            bots=sum(1 for member in guild.members if member.bot),
+            roles=len(guild.roles),
+            channels=len(guild.channels),
+            bots_exact=guild.chunked,
+        )
+
+    def count_bots(self, guild):
+        # まだ正確なBot数が無ければ、裏でメンバー一覧APIを1周する（数え終えたら二度としない）
+        counts = self.counts.get(guild.id)
+        if counts is None or counts.bots_exact or guild.id in self._seeding:
+            return
+        self._seeding[guild.id] = asyncio.create_task(self._count_bots(guild))
+
+    async def _count_bots(self, guild):
+        # チャンクしていないギルドはメンバー一覧APIでBot数だけを数える（キャッシュには載せない）
+        try:
+            bots = 0
+            async for member in guild.fetch_members(limit=None):
+                if member.bot:
+                    bots += 1
+            counts = self.counts.get(guild.id)
+            if counts is not None:
+                counts.bots = bots
+                counts.bots_exact = True
+        except Exception as e:
+            print(f"⚠️ Bot数の集計に失敗しました（{guild.name}）: {e}")
+        finally:
+            self._seeding.pop(guild.id, None)
+
+    def drop(self, guild_id):
+        self.counts.pop(guild_id, None)
+        task = self._seeding.pop(guild_id, None)
+        if task:
+            task.cancel()
+
+    def member_joined(self, guild_id, is_bot):
+        counts = self.counts.get(guild_id)
+        if counts is None:
+            return
+        counts.members += 1
+        if is_bot:
+            counts.bots += 1
+
+    def member_left(self, guild_id, is_bot):
+        counts = self.counts.get(guild_id)
+        if counts is None:
+            return
+        counts.members = max(0, counts.members - 1)
+        if is_bot:
+            counts.bots = max(0, counts.bots - 1)
+
+    def add(self, guild_id, field, delta):
+        counts = self.counts.get(guild_id)
+        if counts is not None:
+            setattr(counts, field, max(0, getattr(counts, field) + delta))
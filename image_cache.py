@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from atomic_file import write_json_atomic, write_text_atomic
+
+IMAGE_CACHE_DIR = "image_cache"
+IMAGE_CACHE_LIMIT = int(os.getenv("IMAGE_CACHE_LIMIT_MB", "200")) * 1024 * 1024
+INDEX_SAVE_INTERVAL = 60  # 秒。目次の変更（最終使用時刻など）はこの間隔でまとめて書き出す
+
+
+def content_key(data: bytes, max_size_bytes: int) -> str:
+    # 同じ画像でも目標サイズが違えば結果も違うので、目標サイズも鍵に含める
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest}-{max_size_bytes}"
+
+
+class ImageCache:
+    """
+    圧縮済みWebPを元画像の内容ハッシュで保存するディスクキャッシュ。
+    index.json に {key: {"size", "quality", "width", "height", "encodes", "last_used"}} を持ち、
+    合計サイズが上限を超えたら最後に使われたのが古いものから消す。
+    目次の変更はメモリ上で dirty にするだけで、save_in_background()（定期）と save()（終了時）で書き出す。
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_LIMIT):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self.entries = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.webp")
+
+    def load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 画像キャッシュの目次の読み込みに失敗しました: {e}")
+                self.entries = {}
+        # 目次とファイルの食い違い（書き込み途中の終了など）を片付ける
+        self.entries = {key: meta for key, meta in self.entries.items() if os.path.exists(self._path(key))}
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp") or (name.endswith(".webp") and name[:-5] not in self.entries):
+                os.remove(os.path.join(self.directory, name))
+
+    def save(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        write_json_atomic(self.index_path, self.entries)
+
+    async def save_in_background(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        # 目次はイベントループ上で文字列にしてから、書き込み（fsync）だけをスレッドで行う
+        text = json.dumps(self.entries)
+        try:
+            await asyncio.to_thread(write_text_atomic, self.index_path, text)
+        except OSError:
+            self._dirty = True
+            raise
+
+    @property
+    def total_bytes(self):
+        return sum(meta["size"] for meta in self.entries.values())
+
+    def get(self, key):
+        """
+        キャッシュにあれば (パス, メタ情報) を返す。
+        """
+        meta = self.entries.get(key)
+        if meta is None or not os.path.exists(self._path(key)):
+            if self.entries.pop(key, None) is not None:
+                self._dirty = True
+            self.misses += 1
+            return None
+        meta["last_used"] = time.time()
+        self._dirty = True
+        self.hits += 1
+        return self._path(key), meta
+
+    def reserve(self, key):
+        """
+        圧縮結果の書き込み先。同時に同じ画像が来ても衝突しないよう一意な一時ファイル名にする。
+        """
+        return os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.tmp")
+
+    def put(self, key, tmp_path, result):
+        path = self._path(key)
+        os.replace(tmp_path, path)
+        self.entries[key] = {
+            "size": result.size,
+            "quality": result.quality,
+            "width": result.width,
+            "height": result.height,
+            "encodes": result.encodes,
+            "last_used": time.time(),
+        }
+        self._evict(keep=key)
+        self._dirty = True
+        return path, self.entries[key]
+
+    def discard(self, tmp_path):
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        total = self.total_bytes
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries.pop(key)["size"]
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from image_utils import compress_image
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_PER_USER_LIMIT = 1  # 1人が同時に投入できるジョブ数（実行中＋順番待ち）
+IMAGE_QUEUE_LIMIT = 20  # 順番待ちの上限
+IMAGE_TIMEOUT = 120  # 1ジョブあたりの圧縮時間の上限（秒）
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ImageEncodePool:
+    """
+    画像のエンコードをイベントループの外（プロセスプール）で実行する。
+    ワーカー数を超えたジョブは受付順に待たせ、待ち順位をコールバックで知らせる。
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS, per_user: int = IMAGE_PER_USER_LIMIT,
+                 queue_limit: int = IMAGE_QUEUE_LIMIT, timeout: float = IMAGE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.per_user = per_user
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = None
+        self._waiting = deque()
+        self._running = 0
+        self._per_user = {}
+        self._cond = asyncio.Condition()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # fork はスレッドを持つ親プロセスから使うと危険なので spawn で起動する
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def position(self, job):
+        # 実行待ちの何番目か（1始まり）。実行中なら 0
+        try:
+            return self._waiting.index(job) + 1
+        except ValueError:
+            return 0
+
+    def user_jobs(self, user_id):
+        return self._per_user.get(user_id, 0)
+
+    async def compress(self, user_id, input_path, output_path, on_position=None, **kwargs):
+        """
+        compress_image をワーカープロセスで実行する。
+        on_position(n) は待ち順位が変わるたびに呼ばれる（n=0 で実行開始）。
+        """
+        if self._per_user.get(user_id, 0) >= self.per_user:
+            raise QueueFull("前の画像を処理中です。終わってからもう一度お試しください")
+        if len(self._waiting) >= self.queue_limit:
+            raise QueueFull("順番待ちが混み合っています。しばらくしてからお試しください")
+
+        job = object()
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._waiting.append(job)
+        started = False
+        try:
+            last_position = None
+            while True:
+                async with self._cond:
+                    if self._waiting[0] is job and self._running < self.workers:
+                        self._waiting.popleft()
+                        self._running += 1
+                        started = True
+                        # 後ろのジョブの順位が1つ繰り上がる
+                        self._cond.notify_all()
+                        break
+                    position = self.position(job)
+                    if position == last_position:
+                        await self._cond.wait()
+                        continue
+                # 順位の通知（Discordへの編集）はロックの外で行う
+                last_position = position
+                if on_position:
+                    await on_position(position)
+            if on_position:
+                await on_position(0)
+
+            # ワーカー側でも期限を過ぎたらエンコードの合間で打ち切る
+            deadline = time.time() + self.timeout
+            loop = asyncio.get_running_loop()
+            work = partial(compress_image, input_path, output_path, deadline=deadline, **kwargs)
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(self._get_executor(), work), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError("画像の圧縮が時間内に終わりませんでした")
+            except BrokenProcessPool:
+                # ワーカーが落ちた（メモリ不足など）場合は次のジョブのためにプールを作り直す
+                self.shutdown()
+                raise
+        finally:
+            if not started and job in self._waiting:
+                self._waiting.remove(job)
+            remaining = self._per_user.get(user_id, 1) - 1
+            if remaining > 0:
+                self._per_user[user_id] = remaining
+            else:
+                self._per_user.pop(user_id, None)
+            async with self._cond:
+                if started:
+                    self._running -= 1
+                self._cond.notify_all()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,10 +1,96 @@
 from PIL import Image
-import os
+from collections import namedtuple
+import io
+import time
 
-def compress_image(input_path: str, output_path: str, max_size_bytes: int = 1048576):
+MAX_QUALITY = 95
+MIN_QUALITY = 15
+QUALITY_TOLERANCE = 3  # 二分探索をこの幅まで絞ったら打ち切る
+MIN_SCALE = 0.5  # 1回の縮小で小さくしすぎないようにする下限
+MAX_DOWNSCALES = 6
+
+CompressResult = namedtuple("CompressResult", ["path", "size", "quality", "width", "height", "encodes"])
+
+
+def predict_quality(pixels: int, max_size_bytes: int) -> int:
+    """
+    1画素あたりに使えるビット数から、最初に試す品質を決める。
+    """
+    bits_per_pixel = max_size_bytes * 8 / max(pixels, 1)
+    if bits_per_pixel >= 4:
+        return MAX_QUALITY
+    if bits_per_pixel >= 2:
+        return 90
+    if bits_per_pixel >= 1:
+        return 80
+    if bits_per_pixel >= 0.5:
+        return 65
+    if bits_per_pixel >= 0.25:
+        return 45
+    return 25
+
+
+def _check_deadline(deadline):
+    if deadline is not None and time.time() > deadline:
+        raise TimeoutError("画像の圧縮が時間内に終わりませんでした")
+
+
+def _encode(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format="WEBP", quality=quality, method=6)
+    return buffer.getvalue()
+
+
+def encode_webp(img, max_size_bytes: int = 1048576, deadline: float = None):
+    """
+    max_size_bytes 以下に収まる、できるだけ高い品質のWebPをメモリ上で作る。
+    品質は画素数から予測した値を起点に二分探索し、最低品質でも収まらなければ縮小して探し直す。
+    (データ, 品質, 画像, エンコード回数) を返す。
+    """
+    encodes = 0
+    for _ in range(MAX_DOWNSCALES + 1):
+        best = None
+        smallest = None
+        low, high = MIN_QUALITY, MAX_QUALITY
+        quality = predict_quality(img.width * img.height, max_size_bytes)
+        while low <= high:
+            _check_deadline(deadline)
+            data = _encode(img, quality)
+            encodes += 1
+            if len(data) <= max_size_bytes:
+                best = (data, quality)
+                low = quality + 1
+            else:
+                smallest = len(data) if smallest is None else min(smallest, len(data))
+                high = quality - 1
+            # 収まる品質が見つかっていて、残りの幅が小さければ見た目は変わらないので打ち切る
+            if best is not None and high - low < QUALITY_TOLERANCE:
+                break
+            if best is None and len(data) > max_size_bytes * 2:
+                # 大きく超えている場合は最低品質で収まるかを先に確かめる（無理なら縮小へ）
+                quality = low
+            else:
+                quality = (low + high + 1) // 2
+
+        if best is not None:
+            return best[0], best[1], img, encodes
+
+        # 最低品質でも収まらない → 超過分に合わせて縮小（面積比なので平方根をとる）
+        scale = (max_size_bytes / smallest) ** 0.5 * 0.9
+        scale = min(0.9, max(MIN_SCALE, scale))
+        width = max(1, int(img.width * scale))
+        height = max(1, int(img.height * scale))
+        img = img.resize((width, height), Image.LANCZOS)
+
+    raise Exception("WebP画像の圧縮に失敗しました（1MB以下にできませんでした）")
+
+
+def compress_image(input_path: str, output_path: str, max_size_bytes: int = 1048576, deadline: float = None):
     """
     入力画像をWebP形式で1MB以下に圧縮し、出力パスに保存する。
     透過PNGにも対応（透過情報がある場合はRGBAとして保存）。
+    deadline（time.time() の値）を過ぎたらエンコードの合間で打ち切る。
+    /画像圧縮 ではワーカープロセス内でこの関数が呼ばれる。
     """
     img = Image.open(input_path)
 
@@ -14,15 +100,11 @@ def compress_image(input_path: str, output_path: str, max_size_bytes: int = 1048
     else:
         img = img.convert("RGB")
 
-    quality = 95
-
-    while quality > 10:
-        img.save(output_path, format="WEBP", quality=quality, method=6)
-        if os.path.getsize(output_path) <= max_size_bytes:
-            return output_path
-        quality -= 5
-
-    raise Exception("WebP画像の圧縮に失敗しました（1MB以下にできませんでした）")
+    data, quality, img, encodes = encode_webp(img, max_size_bytes, deadline)
+    # ディスクに書くのは最終結果の1回だけ
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return CompressResult(output_path, len(data), quality, img.width, img.height, encodes)
 
 # 使用例
 # compress_image("original.png", "compressed.webp")
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+import discord
+
+MEMBER_LRU_SIZE = 256
+
+
+class MemberResolver:
+    """
+    メンバーキャッシュを持たない（軽量モード）場合でも、リマインドのDM宛先を引けるようにする。
+    キャッシュ → 小さなLRU → fetch_member（HTTP）の順に探す。
+    """
+
+    def __init__(self, maxsize: int = MEMBER_LRU_SIZE):
+        self.maxsize = maxsize
+        self._lru = OrderedDict()
+
+    async def resolve(self, guild, user_id):
+        if user_id is None:
+            return None
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+
+        key = (guild.id, user_id)
+        member = self._lru.get(key)
+        if member is not None:
+            self._lru.move_to_end(key)
+            return member
+
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        self._lru[key] = member
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+        return member
+
+    def forget(self, guild_id, user_id):
+        self._lru.pop((guild_id, user_id), None)
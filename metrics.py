@@ -0,0 +1,174 @@
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+SAMPLE_SIZE = 256  # 分位点の計算に使う直近の観測値の数
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 今のタスクで行っているDiscordへのリクエストの持ち主（cog, guild）。429 の回数のラベルに使う
+_request_labels = contextvars.ContextVar("request_labels", default={})
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Summary:
+    """
+    観測値の件数・合計・最大と、直近の値（分位点用）。
+    """
+
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """
+    ループの所要時間・シート取得・Discord送信などの計測値を、名前とラベル（cog, guild など）ごとに持つ。
+    counter（累積）/ gauge（現在値）/ summary（所要時間などの分布）の3種類。
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.summaries = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        summary = self.summaries.get(key)
+        if summary is None:
+            summary = self.summaries[key] = Summary()
+        summary.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        # 例外で抜けた場合も所要時間は記録する
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def find(self, name, **labels):
+        """
+        name の summary のうち、labels をすべて含むもの（/stats 表示用）。
+        """
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        return [(dict(key_labels), summary) for (key_name, key_labels), summary in self.summaries.items()
+                if key_name == name and wanted <= set(key_labels)]
+
+    def total(self, name, **labels):
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        return sum(value for (key_name, key_labels), value in self.counters.items()
+                   if key_name == name and wanted <= set(key_labels))
+
+    def gauge(self, name, **labels):
+        return self.gauges.get(self._key(name, labels), 0)
+
+    def render_prometheus(self):
+        """
+        Prometheus のテキスト形式で書き出す。
+        """
+        lines = []
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        def grouped(items):
+            groups = {}
+            for (name, labels), value in items:
+                groups.setdefault(name, []).append((labels, value))
+            return sorted(groups.items())
+
+        for name, series in grouped(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{label_text(labels)} {value}" for labels, value in series)
+        for name, series in grouped(self.gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{label_text(labels)} {value}" for labels, value in series)
+        for name, series in grouped(self.summaries.items()):
+            lines.append(f"# TYPE {name} summary")
+            for labels, summary in series:
+                for q in QUANTILES:
+                    lines.append(f"{name}{label_text(labels, [('quantile', q)])} {summary.quantile(q):.6f}")
+                lines.append(f"{name}_sum{label_text(labels)} {summary.total:.6f}")
+                lines.append(f"{name}_count{label_text(labels)} {summary.count}")
+        lines.append("# TYPE bot_uptime_seconds gauge")
+        lines.append(f"bot_uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def request_labels(**labels):
+    """
+    この中で行うDiscordへのリクエストで 429 が返ったら、labels（cog, guild）を付けて数える。
+    """
+    token = _request_labels.set(labels)
+    try:
+        yield
+    finally:
+        _request_labels.reset(token)
+
+
+class RateLimitCounter(logging.Handler):
+    """
+    discord.py は 429 を内部で待って再送するので、警告ログを数えて429の回数にする。
+    ログはリクエストしたタスクの中で出るので、request_labels() で付けた cog / guild も付ける。
+    """
+
+    def __init__(self, registry):
+        super().__init__(level=logging.WARNING)
+        self.registry = registry
+
+    def emit(self, record):
+        message = str(record.msg)
+        labels = _request_labels.get()
+        cog, guild = labels.get("cog", ""), labels.get("guild", "")
+        if message.startswith("We are being rate limited"):
+            method = record.args[0] if record.args else "?"
+            self.registry.inc("discord_rate_limited_total", method=method, cog=cog, guild=guild)
+        elif message.startswith("Global rate limit"):
+            self.registry.inc("discord_rate_limited_total", method="global", cog=cog, guild=guild)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def install_rate_limit_counter(registry=REGISTRY):
+    logger = logging.getLogger("discord.http")
+    if not any(isinstance(h, RateLimitCounter) for h in logger.handlers):
+        logger.addHandler(RateLimitCounter(registry))
@@ -0,0 +1,199 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+import aiohttp
+import discord
+
+from metrics import REGISTRY, request_labels
+
+# Discordのメッセージ送信はチャンネルごとに「5秒間に5回」まで。これを超えないように間隔を空けて送る
+BUCKET_SIZE = 5
+BUCKET_PERIOD = 5.0
+# 1通にまとめられる上限（Discordの制限）
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+# 送信に失敗したときの再送（RETRY_BASE 秒から倍々に待つ。429 と 5xx・通信エラーのみ）
+MAX_RETRIES = 4
+RETRY_BASE = 1.0
+
+
+class RateBucket:
+    """
+    送信先ごとのトークンバケット。size 回までは続けて送れ、以降は period / size 秒に1回。
+    """
+
+    def __init__(self, size=BUCKET_SIZE, period=BUCKET_PERIOD):
+        self.size = size
+        self.period = period
+        self.tokens = float(size)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.size, self.tokens + (now - self.updated) * self.size / self.period)
+        self.updated = now
+
+    async def acquire(self):
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) * self.period / self.size)
+            self._refill()
+        self.tokens -= 1
+
+    def drain(self):
+        # 429 が返ってきたら手持ちを捨てて、次は補充を待ってから送る
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+
+class OutgoingMessage:
+    """
+    送信待ちの1通。続けて積まれた同じ送信先の1通は merge() で本文・埋め込みをまとめる。
+    """
+
+    def __init__(self, destination, content, embeds, silent, labels, loop):
+        self.destination = destination
+        self.content = content
+        self.embeds = embeds
+        self.silent = silent
+        self.labels = labels
+        self.queued_at = time.perf_counter()
+        self.futures = [loop.create_future()]
+
+    def can_merge(self, other):
+        if other.silent != self.silent:
+            return False
+        if len(self.embeds) + len(other.embeds) > MAX_EMBEDS:
+            return False
+        if sum(len(embed) for embed in self.embeds + other.embeds) > MAX_EMBED_CHARS:
+            return False
+        if self.content and other.content:
+            return len(self.content) + 1 + len(other.content) <= MAX_CONTENT
+        return True
+
+    def merge(self, other):
+        if self.content and other.content:
+            self.content = f"{self.content}\n{other.content}"
+        else:
+            self.content = self.content or other.content
+        self.embeds = self.embeds + other.embeds
+        self.futures += other.futures
+
+    def resolve(self, delivered):
+        for future in self.futures:
+            if not future.done():
+                future.set_result(delivered)
+
+
+class Outbox:
+    """
+    Discordへの送信をまとめて受け持つ送信キュー。
+    送信先（チャンネル・スレッド・DMの相手）ごとに順番を守って1つずつ送り、
+    続けて積まれたものは1通にまとめる。send() は積むだけで待たず、
+    送れたかどうか（True/False）が入る Future を返す。
+    """
+
+    def __init__(self, bucket_size=BUCKET_SIZE, bucket_period=BUCKET_PERIOD, registry=REGISTRY):
+        self.bucket_size = bucket_size
+        self.bucket_period = bucket_period
+        self.registry = registry
+        self._queues = {}   # {送信先ID: deque[OutgoingMessage]}
+        self._buckets = {}  # {送信先ID: RateBucket}
+        self._workers = {}  # {送信先ID: asyncio.Task}
+        self.depth = 0
+
+    def send(self, destination, content=None, *, embed=None, silent=False, **labels):
+        """
+        labels（cog, guild など）は送信時間などの計測値のラベルになる。
+        """
+        loop = asyncio.get_running_loop()
+        message = OutgoingMessage(destination, content, [embed] if embed else [], silent, labels, loop)
+        key = destination.id
+        self._queues.setdefault(key, deque()).append(message)
+        self._set_depth(1)
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+        return message.futures[0]
+
+    def _set_depth(self, delta):
+        self.depth += delta
+        self.registry.set("outbox_depth", self.depth)
+
+    async def _drain(self, key):
+        queue = self._queues[key]
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = RateBucket(self.bucket_size, self.bucket_period)
+        message = None
+        try:
+            while queue:
+                # 待っている間に積まれた分も、次の1通にまとめて送る
+                await bucket.acquire()
+                message = queue.popleft()
+                self._set_depth(-1)
+                while queue and message.can_merge(queue[0]):
+                    message.merge(queue.popleft())
+                    self._set_depth(-1)
+                    self.registry.inc("outbox_coalesced_total", **message.labels)
+                delivered = await self._deliver(message, bucket)
+                message.resolve(delivered)
+                message = None
+        finally:
+            # 停止（cancel）された場合は残りを送らずに終える
+            if message is not None:
+                message.resolve(False)
+            while queue:
+                queue.popleft().resolve(False)
+                self._set_depth(-1)
+            del self._queues[key]
+            del self._workers[key]
+
+    async def _deliver(self, message, bucket):
+        kwargs = {"silent": message.silent}
+        if message.embeds:
+            kwargs["embeds"] = message.embeds
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                with self.registry.timer("discord_send_seconds", **message.labels), request_labels(**message.labels):
+                    await message.destination.send(message.content, **kwargs)
+                self.registry.observe("outbox_wait_seconds", time.perf_counter() - message.queued_at,
+                                      cog=message.labels.get("cog", ""))
+                return True
+            except discord.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    # 権限が無い・送信先が消えた等は送り直しても届かない
+                    print(f"⚠️ メッセージを送信できませんでした（{getattr(message.destination, 'name', message.destination.id)}）: {e}")
+                    break
+                if e.status == 429:
+                    bucket.drain()
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                error = e
+            if attempt == MAX_RETRIES:
+                print(f"⚠️ メッセージを{MAX_RETRIES + 1}回送信できなかったため諦めます: {error}")
+                break
+            self.registry.inc("outbox_retries_total", **message.labels)
+            await asyncio.sleep(RETRY_BASE * 2 ** attempt * random.uniform(0.5, 1.5))
+        self.registry.inc("outbox_dropped_total", **message.labels)
+        return False
+
+    async def join(self):
+        # 積まれている分をすべて送り終えるまで待つ
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
+
+    async def close(self):
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # 動き出す前に止められた送信先は _drain の finally を通らないので、ここで片付ける
+        for queue in self._queues.values():
+            while queue:
+                queue.popleft().resolve(False)
+                self._set_depth(-1)
+        self._queues.clear()
+        self._workers.clear()
@@ -1,15 +1,22 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 from datetime import datetime, timedelta
-import json
+import asyncio
+import heapq
+import itertools
 import pytz
-import os
 from typing import Optional, Union
 from enum import Enum
+from reminder_store import ReminderStore
+from member_lookup import MemberResolver
+from metrics import REGISTRY
 
-REMIND_PATH = "remind_config.json"
-CONFIG_PATH = "config.json"  # configからチャンネル名参照
+DEFAULT_REMIND_CHANNEL = "スタッフ連絡"  # config に default_remind_channel が無い場合の送信先
+REPEAT_INTERVALS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(days=7),
+}
 
 class VisibilityOption(Enum):
     全員 = "true"
@@ -21,32 +28,50 @@ class RepeatOption(Enum):
     毎週 = "weekly"
 
 class RemindCog(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, config, outbox):
         self.bot = bot
+        self.config = config
+        self.outbox = outbox
         self.tz = pytz.timezone("Asia/Tokyo")
-        self.reminders = self.load_reminders()
-        self.config = self.load_config()
-        self.remind_loop.change_interval(seconds=1)
-        self.remind_loop.start()
+        self.reminders = ReminderStore()
+        self.members = MemberResolver()
+        # (送信予定時刻, 連番, guild_id, リマインドID) の優先度付きキュー
+        self._queue = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+        for guild_id, item in self.reminders.all_items():
+            self.schedule(guild_id, item, wake=False)
+
+    async def cog_load(self):
+        self.reminders.start()
+        self._task = asyncio.create_task(self.remind_loop())
 
     def cog_unload(self):
-        self.remind_loop.cancel()
+        if self._task:
+            self._task.cancel()
+        self.reminders.close()
 
-    def load_reminders(self):
-        if os.path.exists(REMIND_PATH):
-            with open(REMIND_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload):
+        self.members.forget(payload.guild_id, payload.user.id)
 
-    def save_reminders(self):
-        with open(REMIND_PATH, "w", encoding="utf-8") as f:
-            json.dump(self.reminders, f, ensure_ascii=False, indent=2)
+    def due_time(self, item):
+        return self.tz.localize(datetime.strptime(f"{item['date']} {item['time']}", "%Y%m%d %H:%M"))
 
-    def load_config(self):
-        if os.path.exists(CONFIG_PATH):
-            with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+    def schedule(self, guild_id, item, wake=True):
+        try:
+            due = self.due_time(item)
+        except (KeyError, ValueError) as e:
+            print(f"⚠️ リマインドの日時が不正です: {e}")
+            return
+        heapq.heappush(self._queue, (due, next(self._seq), guild_id, item["id"]))
+        if wake:
+            self._wake.set()
+
+    def unschedule(self):
+        # 削除済みのエントリはヒープから取り出した時に捨てる（遅延削除）
+        self._wake.set()
 
     @app_commands.command(name="リマインド", description="リマインドを設定します（改行入力可能）")
     @app_commands.describe(
@@ -89,29 +114,28 @@ class RemindCog(commands.Cog):
     @app_commands.describe(番号="削除したいリマインドの番号（一覧で表示された番号）")
     async def delete_reminder(self, interaction: discord.Interaction, 番号: int):
         guild_id = str(interaction.guild_id)
-        items = self.reminders.get(guild_id, [])
+        deleted = self.reminders.remove(guild_id, 番号)
 
-        if 番号 <= 0 or 番号 > len(items):
+        if deleted is None:
             await interaction.response.send_message("⚠️ 無効な番号です。", ephemeral=True)
             return
 
-        deleted = items.pop(番号 - 1)
-        self.reminders[guild_id] = items
-        self.save_reminders()
+        self.unschedule()
 
         await interaction.response.send_message(f"🗑 リマインド削除済み：{deleted['date']} {deleted['time']} {deleted['mention_target']} → {deleted['message']}", ephemeral=True)
 
     @app_commands.command(name="リマインド一覧", description="設定されているリマインドを表示します")
     async def list_reminders(self, interaction: discord.Interaction):
         guild_id = str(interaction.guild_id)
-        items = self.reminders.get(guild_id, [])
+        items = self.reminders.list(guild_id)
 
         if not items:
             await interaction.response.send_message("🔕 設定されているリマインドはありません。", ephemeral=True)
             return
 
         lines = []
-        for idx, item in enumerate(items, 1):
+        length = 0
+        for count, item in enumerate(items):
             channel_part = f" → <#{item['channel_id']}>" if item.get("channel_id") else ""
             repeat_label = {
                 "once": "一回のみ",
@@ -121,57 +145,80 @@ class RemindCog(commands.Cog):
             visibility = "全員" if item.get("公開") else "自分"
             formatted_date = datetime.strptime(item['date'], "%Y%m%d").strftime("%Y-%m-%d")
             content = item['message'] if item.get("公開") else "（内容は非公開）"
-            line = f"{idx}. 📅 {formatted_date} 🕒 {item['time']} | {item['mention_target'] or 'なし'} | {content}{channel_part} [{repeat_label} / {visibility}] by {item.get('user_tag', '不明')}"
+            line = f"{item['id']}. 📅 {formatted_date} 🕒 {item['time']} | {item['mention_target'] or 'なし'} | {content}{channel_part} [{repeat_label} / {visibility}] by {item.get('user_tag', '不明')}"
+            # Discordのメッセージ上限（2000文字）に収まる分だけ表示する
+            if length + len(line) > 1800:
+                lines.append(f"…ほか{len(items) - count}件")
+                break
             lines.append(line)
+            length += len(line) + 1
 
         msg = "\n".join(lines)
         await interaction.response.send_message(f"📋 リマインド一覧：\n{msg}", ephemeral=True)
 
-    @tasks.loop(seconds=1)
     async def remind_loop(self):
-        now = datetime.now(self.tz)
-        now_str = now.strftime("%Y%m%d %H:%M")
-        for guild in self.bot.guilds:
-            guild_id = str(guild.id)
-            settings = self.reminders.get(guild_id, [])
-            default_channel_name = self.config.get(guild_id, {}).get("default_remind_channel", "スタッフ連絡")
-            new_settings = []
-
-            for item in settings:
-                remind_at = f"{item['date']} {item['time']}"
-                if now_str == remind_at:
-                    channel = self.bot.get_channel(item.get("channel_id")) if item.get("channel_id") else discord.utils.get(guild.text_channels, name=default_channel_name)
-                    content = f"{item['mention_target']}\n{item['message']}" if item.get("mention_target") else item['message']
-
-                    if item.get("公開"):
-                        if channel:
-                            try:
-                                await channel.send(content, silent=False)
-                            except Exception as e:
-                                print(f"⚠️ チャンネル送信エラー: {e}")
-                    else:
-                        user = guild.get_member(item.get("user_id"))
-                        if user:
-                            try:
-                                await user.send(f"【非公開リマインド】\n{content}")
-                            except Exception as e:
-                                print(f"⚠️ DM送信エラー: {e}")
-
-                    if item.get("repeat") == "daily":
-                        item['date'] = (now + timedelta(days=1)).strftime("%Y%m%d")
-                        new_settings.append(item)
-                    elif item.get("repeat") == "weekly":
-                        item['date'] = (now + timedelta(days=7)).strftime("%Y%m%d")
-                        new_settings.append(item)
-                else:
-                    new_settings.append(item)
-
-            self.reminders[guild_id] = new_settings
-            self.save_reminders()
-
-    @remind_loop.before_loop
-    async def before_remind_loop(self):
+        """
+        次に送信予定のリマインドの時刻まで眠り、期限が来たものを送信する。
+        追加・削除時は起こされて待ち時間を計算し直す。
+        停止や再起動で時刻を過ぎたリマインドも取りこぼさずに送信する。
+        """
         await self.bot.wait_until_ready()
+        while True:
+            now = datetime.now(self.tz)
+            while self._queue and self._queue[0][0] <= now:
+                due, _, guild_id, reminder_id = heapq.heappop(self._queue)
+                item = self.reminders.get(guild_id, reminder_id)
+                if item is None or due != self.due_time(item):
+                    continue  # 削除済み、または日時が変更された古いエントリ
+                guild = self.bot.get_guild(int(guild_id))
+                if guild is None:
+                    continue
+                # 予定時刻から実際に送信を始めるまでの遅れ
+                REGISTRY.observe("reminder_lag_seconds", (datetime.now(self.tz) - due).total_seconds(), guild=guild_id)
+                try:
+                    await self.fire_reminder(guild, item)
+                except Exception as e:
+                    print(f"⚠️ リマインド送信エラー: {e}")
+                # 送信を待っている間に /リマインド削除 された場合は、繰り返しでも登録し直さない
+                if self.reminders.get(guild_id, item["id"]) is not item:
+                    continue
+                self.reschedule_or_remove(guild_id, item, due, now)
+
+            timeout = (self._queue[0][0] - datetime.now(self.tz)).total_seconds() if self._queue else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def reschedule_or_remove(self, guild_id, item, due, now):
+        interval = REPEAT_INTERVALS.get(item.get("repeat"))
+        if interval is None:
+            self.reminders.remove(guild_id, item["id"])
+            return
+        # 大きく遅れていた場合は、未来になるまで周期分まとめて進める
+        skipped = int((now - due) / interval) + 1
+        next_due = self.tz.normalize(due + interval * skipped)
+        self.reminders.reschedule(guild_id, item, next_due.strftime("%Y%m%d"), next_due.strftime("%H:%M"))
+        self.schedule(guild_id, item, wake=False)
+
+    async def fire_reminder(self, guild, item):
+        if item.get("channel_id"):
+            channel = self.bot.get_channel(item.get("channel_id"))
+        else:
+            cfg = self.config.get(guild.id)
+            channel = (cfg.text_channel(guild, "default_remind_channel", DEFAULT_REMIND_CHANNEL) if cfg
+                       else discord.utils.get(guild.text_channels, name=DEFAULT_REMIND_CHANNEL))
+        content = f"{item['mention_target']}\n{item['message']}" if item.get("mention_target") else item['message']
+
+        # 送信は送信キューに任せ、待たずに次のリマインドへ進む
+        if item.get("公開"):
+            if channel:
+                self.outbox.send(channel, content, cog="remind", guild=guild.id)
+        else:
+            user = await self.members.resolve(guild, item.get("user_id"))
+            if user:
+                self.outbox.send(user, f"【非公開リマインド】\n{content}", cog="remind", guild=guild.id)
 
 class RemindModal(discord.ui.Modal, title="リマインド内容入力"):
     内容 = discord.ui.TextInput(label="通知メッセージ（複数行可）", style=discord.TextStyle.paragraph)
@@ -190,10 +237,7 @@ class RemindModal(discord.ui.Modal, title="リマインド内容入力"):
 
     async def on_submit(self, interaction: discord.Interaction):
         guild_id = str(interaction.guild_id)
-        if guild_id not in self.cog.reminders:
-            self.cog.reminders[guild_id] = []
-
-        self.cog.reminders[guild_id].append({
+        item = {
             "message": self.内容.value,
             "date": self.日付,
             "time": self.時間,
@@ -203,8 +247,9 @@ class RemindModal(discord.ui.Modal, title="リマインド内容入力"):
             "repeat": self.repeat_mode,
             "user_id": self.user_id,
             "user_tag": self.user_tag
-        })
-        self.cog.save_reminders()
+        }
+        self.cog.reminders.add(guild_id, item)
+        self.cog.schedule(guild_id, item)
 
         repeat_label = {
             "once": "一回のみ",
@@ -0,0 +1,186 @@
+import asyncio
+import bisect
+import json
+import os
+
+from atomic_file import write_text_atomic
+
+REMIND_PATH = "remind_config.json"
+FLUSH_DELAY = 2  # 秒。この間の変更は1回の書き込みにまとめる
+STORE_VERSION = 2
+
+
+def due_key(item):
+    # "YYYYMMDD HH:MM" は文字列のままで時刻順に並ぶ
+    return f"{item['date']} {item['time']}"
+
+
+class ReminderStore:
+    """
+    リマインドの保存先。
+    ・リマインドごとに変わらないID（"id"）を振る
+    ・ギルドごとに ID → リマインド、送信予定時刻順、登録ユーザー別の索引を持つ
+    ・変更は dirty として記録し、まとめて1回でファイルに書き出す（一時ファイル + fsync + 置き換え）
+    """
+
+    def __init__(self, path: str = REMIND_PATH):
+        self.path = path
+        self.next_id = 1
+        self.by_id = {}     # {guild_id: {id: item}}
+        self.by_due = {}    # {guild_id: [(due_key, id), ...]}（昇順）
+        self.by_owner = {}  # {guild_id: {user_id: set(id)}}
+        self._dirty = False
+        self._dirty_event = None
+        self._writer = None
+        self.load()
+
+    # ---- 読み込み ----
+
+    def load(self):
+        data = None
+        # 本体 → 書き込み途中の一時ファイル → 1つ前の世代 の順に読めるものを使う
+        for candidate in (self.path, f"{self.path}.tmp", f"{self.path}.bak"):
+            data = self._read(candidate)
+            if data is not None:
+                if candidate != self.path:
+                    print(f"⚠️ {self.path} が読めないため {candidate} から復旧しました")
+                    self._dirty = True
+                break
+        if data is None:
+            return
+
+        if data.get("version") == STORE_VERSION:
+            self.next_id = data.get("next_id", 1)
+            guilds = data.get("reminders", {})
+        else:
+            # 旧形式 {guild_id: [リマインド, ...]} はIDを振り直して移行する
+            guilds = data
+            self._dirty = True
+
+        for guild_id, items in guilds.items():
+            for item in items:
+                if "id" not in item:
+                    item["id"] = self.next_id
+                self.next_id = max(self.next_id, item["id"] + 1)
+                self._index(guild_id, item)
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # ---- 索引 ----
+
+    def _index(self, guild_id, item):
+        self.by_id.setdefault(guild_id, {})[item["id"]] = item
+        bisect.insort(self.by_due.setdefault(guild_id, []), (due_key(item), item["id"]))
+        self.by_owner.setdefault(guild_id, {}).setdefault(item.get("user_id"), set()).add(item["id"])
+
+    def _unindex(self, guild_id, item):
+        self.by_id.get(guild_id, {}).pop(item["id"], None)
+        due_list = self.by_due.get(guild_id, [])
+        entry = (due_key(item), item["id"])
+        i = bisect.bisect_left(due_list, entry)
+        if i < len(due_list) and due_list[i] == entry:
+            del due_list[i]
+        owned = self.by_owner.get(guild_id, {}).get(item.get("user_id"))
+        if owned:
+            owned.discard(item["id"])
+
+    # ---- 操作 ----
+
+    def add(self, guild_id, item):
+        item["id"] = self.next_id
+        self.next_id += 1
+        self._index(guild_id, item)
+        self.mark_dirty()
+        return item["id"]
+
+    def get(self, guild_id, reminder_id):
+        return self.by_id.get(guild_id, {}).get(reminder_id)
+
+    def remove(self, guild_id, reminder_id):
+        item = self.get(guild_id, reminder_id)
+        if item is None:
+            return None
+        self._unindex(guild_id, item)
+        self.mark_dirty()
+        return item
+
+    def reschedule(self, guild_id, item, date, time):
+        self._unindex(guild_id, item)
+        item["date"] = date
+        item["time"] = time
+        self._index(guild_id, item)
+        self.mark_dirty()
+
+    def list(self, guild_id):
+        # 送信予定時刻順
+        items = self.by_id.get(guild_id, {})
+        return [items[reminder_id] for _, reminder_id in self.by_due.get(guild_id, [])]
+
+    def list_by_owner(self, guild_id, user_id):
+        items = self.by_id.get(guild_id, {})
+        return sorted((items[i] for i in self.by_owner.get(guild_id, {}).get(user_id, ())), key=due_key)
+
+    def all_items(self):
+        for guild_id, items in self.by_id.items():
+            for item in items.values():
+                yield guild_id, item
+
+    # ---- 書き込み ----
+
+    def mark_dirty(self):
+        self._dirty = True
+        if self._dirty_event is not None:
+            self._dirty_event.set()
+
+    def start(self):
+        # 非同期の書き込み担当を起動する（イベントループ上で呼ぶ）
+        self._dirty_event = asyncio.Event()
+        if self._dirty:
+            self._dirty_event.set()
+        self._writer = asyncio.create_task(self._write_behind())
+
+    async def _write_behind(self):
+        while True:
+            await self._dirty_event.wait()
+            await asyncio.sleep(FLUSH_DELAY)
+            self._dirty_event.clear()
+            if not self._dirty:
+                continue
+            # 内容の書き出しはループ上で行い、ファイル書き込みだけを別スレッドに任せる
+            self._dirty = False
+            text = self._snapshot()
+            try:
+                await asyncio.to_thread(self._write, text)
+            except Exception as e:
+                print(f"⚠️ リマインドの保存に失敗しました: {e}")
+                self.mark_dirty()
+
+    def _snapshot(self):
+        snapshot = {
+            "version": STORE_VERSION,
+            "next_id": self.next_id,
+            "reminders": {guild_id: list(items.values()) for guild_id, items in self.by_id.items() if items},
+        }
+        return json.dumps(snapshot, ensure_ascii=False, indent=2)
+
+    def _write(self, text):
+        write_text_atomic(self.path, text, backup=True)
+
+    def flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._write(self._snapshot())
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        self.flush()
@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+import discord
+
+from metrics import REGISTRY
+
+WORK_CHANNEL_NAME = "今日のお仕事"
+
+# 同じ名前の行き先が複数ある場合はカテゴリ内のテキストチャンネルを優先する
+PRIORITY_CATEGORY = 0
+PRIORITY_FORUM = 1
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name):
+    name = re.sub(r"[\s　]", "", name.strip())
+    variants = {
+        "髙": "高",
+        "𠮷": "吉",
+    }
+    for old, new in variants.items():
+        name = name.replace(old, new)
+    return name
+
+
+class RouteIndex:
+    """
+    正規化した人名 → 「今日のお仕事」の送信先（テキストチャンネル or フォーラムのスレッド）の索引。
+    起動時に一度作り、チャンネル・スレッドのイベントで差分更新する。
+    """
+
+    def __init__(self):
+        # {guild_id: {name: {source_id: (priority, destination_id)}}}
+        self.routes = {}
+        # {guild_id: {source_id: name}}（カテゴリ/フォーラムID → 登録した名前）
+        self.sources = {}
+
+    def build(self, guild):
+        self.routes[guild.id] = {}
+        self.sources[guild.id] = {}
+        for category in guild.categories:
+            self.index_category(category)
+        for channel in guild.channels:
+            if isinstance(channel, discord.ForumChannel):
+                self.index_forum(channel)
+
+    def _set(self, guild_id, source_id, name, priority, destination_id):
+        self.remove_source(guild_id, source_id)
+        if destination_id is None:
+            return
+        self.routes.setdefault(guild_id, {}).setdefault(name, {})[source_id] = (priority, destination_id)
+        self.sources.setdefault(guild_id, {})[source_id] = name
+
+    def remove_source(self, guild_id, source_id):
+        name = self.sources.get(guild_id, {}).pop(source_id, None)
+        if name is None:
+            return
+        candidates = self.routes.get(guild_id, {}).get(name)
+        if candidates is not None:
+            candidates.pop(source_id, None)
+            if not candidates:
+                del self.routes[guild_id][name]
+
+    def index_category(self, category):
+        text_channel = discord.utils.get(category.channels, name=WORK_CHANNEL_NAME)
+        destination_id = text_channel.id if isinstance(text_channel, discord.TextChannel) else None
+        self._set(category.guild.id, category.id, normalize_name(category.name), PRIORITY_CATEGORY, destination_id)
+
+    def index_forum(self, forum):
+        thread = discord.utils.get(forum.threads, name=WORK_CHANNEL_NAME)
+        destination_id = thread.id if thread else None
+        self._set(forum.guild.id, forum.id, normalize_name(forum.name), PRIORITY_FORUM, destination_id)
+
+    def on_channel_changed(self, channel, deleted=False):
+        guild_id = channel.guild.id
+        if isinstance(channel, (discord.CategoryChannel, discord.ForumChannel)):
+            if deleted:
+                self.remove_source(guild_id, channel.id)
+            elif isinstance(channel, discord.CategoryChannel):
+                self.index_category(channel)
+            else:
+                self.index_forum(channel)
+        elif channel.category is not None:
+            # 「今日のお仕事」チャンネルの追加・改名・削除は親カテゴリを索引し直す
+            self.index_category(channel.category)
+
+    def on_thread_changed(self, thread):
+        if isinstance(thread.parent, discord.ForumChannel):
+            self.index_forum(thread.parent)
+
+    def lookup(self, guild, normalized_name):
+        candidates = self.routes.get(guild.id, {}).get(normalized_name)
+        if candidates:
+            _, destination_id = min(candidates.values())
+            destination = guild.get_channel_or_thread(destination_id)
+            if destination is not None:
+                REGISTRY.inc("route_lookups_total", guild=guild.id, result="hit")
+                return destination
+
+        # 索引に無い（イベントの取りこぼし等）→ 従来どおり全走査して索引に登録する
+        REGISTRY.inc("route_lookups_total", guild=guild.id, result="miss")
+        for category in guild.categories:
+            if normalize_name(category.name) == normalized_name:
+                self.index_category(category)
+        for channel in guild.channels:
+            if isinstance(channel, discord.ForumChannel) and normalize_name(channel.name) == normalized_name:
+                self.index_forum(channel)
+        candidates = self.routes.get(guild.id, {}).get(normalized_name)
+        if candidates:
+            _, destination_id = min(candidates.values())
+            return guild.get_channel_or_thread(destination_id)
+        return None
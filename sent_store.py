@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from atomic_file import write_text_atomic
+
+SENT_LOG_PATH = "sent_entries.jsonl"
+LEGACY_SENT_PATH = "sent_entries.json"  # 以前の形式（日付なしのキーの一覧）
+KEEP_DAYS = 3
+
+
+class SentEntryStore:
+    """
+    通知済みフォーム回答の重複防止ストア。
+    1通知ごとに {"date": "YYYY/MM/DD", "guild": guild_id, "key": "..."} を1行追記するだけで、
+    ファイル全体は書き直さない。古い日付の行は compact() でまとめて捨てる。
+    メモリには当日分の (guild_id, key) だけを持つ。
+    guild の無い行（以前の形式から取り込んだもの）は、どのギルドの同じキーも通知済みとして扱う。
+    """
+
+    def __init__(self, path: str = SENT_LOG_PATH, keep_days: int = KEEP_DAYS, legacy_path: str = LEGACY_SENT_PATH):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.keep_days = keep_days
+        self.date = None
+        self.keys = set()
+        self._lock = threading.Lock()
+
+    def load(self, date: str):
+        # 指定日（当日）のキーだけを読み込む
+        self.date = date
+        self.keys = set()
+        self._repair_tail()
+        for record in self._read_records():
+            if record.get("date") == date:
+                self.keys.add((record.get("guild"), record.get("key")))
+        self._migrate_legacy(date)
+
+    def _migrate_legacy(self, date: str):
+        """
+        以前の sent_entries.json のキーを当日分として取り込み、ファイルは .migrated に改名する。
+        （日付を持たない形式なので、更新直後の最初の確認で今日の通知を送り直さないようにする）
+        """
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 以前の通知済みログを読み込めませんでした: {e}")
+            return
+        for key in keys:
+            self.add(date, None, key)
+        os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+        print(f"✅ 以前の通知済みログ（{len(keys)}件）を取り込みました")
+
+    def _repair_tail(self):
+        # 追記の途中で落ちて改行が欠けていたら、次の追記が同じ行に混ざらないよう改行を補う
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def _read_records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # 書き込み途中で落ちた最終行などは読み飛ばす
+                    continue
+
+    def _roll(self, date: str):
+        # 日付が進んだら前日分のキーはメモリから外す（前の日付では戻さない）
+        if self.date is None or date > self.date:
+            self.date = date
+            self.keys = set()
+
+    def _past_keys(self, date: str):
+        # 0時をまたいで届いた前日分などは、ジャーナルから直接探す
+        return {(record.get("guild"), record.get("key")) for record in self._read_records() if record.get("date") == date}
+
+    def __contains__(self, item):
+        date, guild_id, key = item
+        self._roll(date)
+        keys = self.keys if date == self.date else self._past_keys(date)
+        return (guild_id, key) in keys or (None, key) in keys
+
+    def add(self, date: str, guild_id, key: str):
+        self._roll(date)
+        if date == self.date:
+            if (guild_id, key) in self.keys:
+                return
+            self.keys.add((guild_id, key))
+        line = json.dumps({"date": date, "guild": guild_id, "key": key}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def compact(self, today: str):
+        """
+        keep_days より古い日付の行を捨ててジャーナルを書き直す。
+        ブロッキング処理なので asyncio.to_thread から呼ぶ。
+        """
+        cutoff = (datetime.strptime(today, "%Y/%m/%d") - timedelta(days=self.keep_days)).strftime("%Y/%m/%d")
+        with self._lock:
+            kept = [record for record in self._read_records() if record.get("date", "") > cutoff]
+            write_text_atomic(self.path, "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in kept))
+        return len(kept)
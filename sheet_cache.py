@@ -0,0 +1,105 @@
+import asyncio
+import csv
+import io
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 30  # 秒
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class CachedSheet:
+    """
+    取得済みのシート1枚分。CSVの解析結果は最初に使われた時に一度だけ作る。
+    """
+
+    def __init__(self, url, body, digest, fetched_at):
+        self.url = url
+        self.body = body
+        self.digest = digest
+        self.fetched_at = fetched_at
+        self._rows = None
+
+    def rows(self):
+        if self._rows is None:
+            text = self.body.decode("utf-8-sig")
+            self._rows = list(csv.reader(io.StringIO(text)))
+        return self._rows
+
+    @property
+    def size(self):
+        # 解析済みの行はおおよそ本文の2倍のメモリを使うものとして数える
+        return len(self.body) * (3 if self._rows is not None else 1)
+
+
+class SheetCache:
+    """
+    エクスポートURLをキーにした共有シートキャッシュ。
+    ・TTL以内の再取得はキャッシュを返す
+    ・同じURLへの同時リクエストは1回のダウンロードにまとめる
+    ・合計サイズが上限を超えたら最後に使われたのが古いものから捨てる
+    labels（cog, guild）は受信量の計測値のラベルになる。まとめたダウンロードは取得した側の分として数える。
+    """
+
+    def __init__(self, fetcher, ttl: float = DEFAULT_TTL, max_bytes: int = MAX_CACHE_BYTES):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def get(self, url: str, max_age: float = None, **labels) -> CachedSheet:
+        max_age = self.ttl if max_age is None else max_age
+        entry = self._entries.get(url)
+        if entry is not None and time.monotonic() - entry.fetched_at < max_age:
+            self._entries.move_to_end(url)
+            return entry
+
+        future = self._inflight.get(url)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[url] = future
+            try:
+                entry = await self._load(url, labels)
+                future.set_result(entry)
+            except Exception as e:
+                future.set_exception(e)
+                # 待っている呼び出し元がいなくても「未取得の例外」警告を出さない
+                future.exception()
+            finally:
+                del self._inflight[url]
+                if not future.done():
+                    # 取得していた側が cancel された → 相乗りしていた呼び出し元は失敗として返す
+                    future.set_exception(ConnectionAbortedError(f"シートの取得が中断されました: {url}"))
+                    future.exception()
+        return await asyncio.shield(future)
+
+    async def get_rows(self, url: str, max_age: float = None, **labels):
+        entry = await self.get(url, max_age, **labels)
+        return entry.rows()
+
+    async def _load(self, url, labels):
+        response = await self.fetcher.fetch_conditional(url, **labels)
+        now = time.monotonic()
+        old = self._entries.get(url)
+        if old is not None and old.digest == response.digest:
+            # 内容が同じなら解析済みの行をそのまま使い回す
+            old.fetched_at = now
+            entry = old
+        else:
+            entry = CachedSheet(url, response.body, response.digest, now)
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        self._evict()
+        return entry
+
+    def _evict(self):
+        total = sum(entry.size for entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            url, entry = self._entries.popitem(last=False)
+            total -= entry.size
+            self.fetcher.forget(url)
+
+    def invalidate(self, url: str):
+        self._entries.pop(url, None)
+        self.fetcher.forget(url)
@@ -0,0 +1,72 @@
+import hashlib
+import time
+from collections import namedtuple
+import aiohttp
+from metrics import REGISTRY
+
+DEFAULT_TIMEOUT = 20  # 秒
+POOL_SIZE = 8
+
+# body: 本文 / digest: 本文のSHA-256 / not_modified: 304で再検証できたか
+SheetResponse = namedtuple("SheetResponse", ["body", "digest", "not_modified"])
+
+
+class SheetFetcher:
+    """
+    スプレッドシートのCSVエクスポートを非同期で取得する。
+    keep-aliveの接続プールを全Cogで共有し、イベントループを止めない。
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, pool_size: int = POOL_SIZE):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.pool_size = pool_size
+        self._session = None
+        # URLごとの再検証情報 {url: (etag, last_modified, SheetResponse)}
+        self._validators = {}
+
+    def _get_session(self):
+        # ClientSessionはイベントループ上で作る必要があるので遅延生成
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def fetch_conditional(self, url: str, timeout: float = None, **labels) -> SheetResponse:
+        """
+        ETag / Last-Modified で再検証しながら取得する。
+        304が返った場合は前回の本文をそのまま返す。labels（cog, guild）は受信量のラベルになる。
+        """
+        session = self._get_session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        headers = {}
+        cached = self._validators.get(url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        started = time.perf_counter()
+        async with session.get(url, headers=headers, timeout=request_timeout) as response:
+            if response.status == 304 and cached:
+                REGISTRY.observe("sheet_fetch_seconds", time.perf_counter() - started, status=304)
+                return cached[2]._replace(not_modified=True)
+            response.raise_for_status()
+            body = await response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+        REGISTRY.observe("sheet_fetch_seconds", time.perf_counter() - started, status=response.status)
+        REGISTRY.inc("sheet_fetch_bytes_total", len(body), **labels)
+
+        result = SheetResponse(body, hashlib.sha256(body).hexdigest(), False)
+        self._validators[url] = (etag, last_modified, result)
+        return result
+
+    def forget(self, url: str):
+        # キャッシュから追い出されたシートの本文を手放す
+        self._validators.pop(url, None)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
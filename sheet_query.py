@@ -0,0 +1,59 @@
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit, urlunsplit
+
+# config の sheet_fetch_mode: "export"（既定。シート全体のCSV）/ "query"（必要な行・列だけ）
+# gviz/tq は列ごとに型を1つに決め、少数派の型のセル（日付の列に混ざった文字列など）を空欄で返す。
+# 実績シートは範囲指定のCSVエクスポートで読むので影響しないが、フォーム回答は gviz/tq で絞り込むため、
+# 型の混ざった列（数値と文字列が混在する回答など）があるフォームでは "query" を使わないこと。
+FETCH_MODE_EXPORT = "export"
+FETCH_MODE_QUERY = "query"
+
+
+def column_letter(index):
+    """
+    0始まりの列番号 → A1形式の列名（0 → "A", 26 → "AA"）。
+    """
+    letters = ""
+    index += 1
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def gviz_url(export_url, **params):
+    """
+    .../spreadsheets/d/<ID>/export?format=csv&gid=<GID> から、同じシートの gviz/tq のURLを作る。
+    params（tq, range, headers など）はそのままクエリに付ける。
+    """
+    parts = urlsplit(export_url)
+    if not parts.path.endswith("/export"):
+        raise ValueError(f"エクスポートURLではありません: {export_url}")
+    query = {"tqx": "out:csv"}
+    gid = parse_qs(parts.query).get("gid")
+    if gid:
+        query["gid"] = gid[0]
+    query.update({key: value for key, value in params.items() if value is not None})
+    path = parts.path[: -len("/export")] + "/gviz/tq"
+    return urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ""))
+
+
+def form_query_url(export_url, day, timestamp_column="A"):
+    """
+    フォーム回答のうち、タイムスタンプが day 以降の行だけ（とヘッダー行）を返す問い合わせ。
+    型の混ざった列では少数派の型の回答が空欄になる（ファイル先頭の注意を参照）。
+    """
+    since = day.strftime("%Y-%m-%d 00:00:00")
+    return gviz_url(export_url, tq=f"select * where {timestamp_column} >= datetime '{since}'", headers=1)
+
+
+def range_url(export_url, cell_range):
+    """
+    "4:4"（4行目だけ）や "D7:D18"（D列の7〜18行目）など、A1形式の範囲だけのCSVエクスポート。
+    gviz/tq と違い型をそろえないので、日付と文字列が混ざった行・列も入力どおりに返る。
+    """
+    parts = urlsplit(export_url)
+    if not parts.path.endswith("/export"):
+        raise ValueError(f"エクスポートURLではありません: {export_url}")
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "range"]
+    query.append(("range", cell_range))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
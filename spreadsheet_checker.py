@@ -1,69 +1,161 @@
-import discord
-from discord.ext import commands, tasks
-from datetime import datetime, timedelta
+from discord.ext import commands
+from datetime import datetime
+from operator import itemgetter
 import pytz
-import csv
-import requests
-from io import StringIO
 import random
-import json
+import asyncio
+from metrics import REGISTRY
+from check_schedule import DEFAULT_CHECK_TIMES, DailySchedule, parse_times
+from sheet_query import FETCH_MODE_QUERY, column_letter, range_url
+
+# 実績シートの既定のレイアウト（行番号はスプレッドシート上の1始まり）
+DEFAULT_DATE_ROW = 4  # 日付の行
+DEFAULT_CHECK_ROWS = (7, 18)  # 入力漏れを確認する行（両端を含む）
+
+
+def column_has_blank(rows, col, first, last):
+    """
+    rows[first:last] の col 列に空欄があるか。列をまとめて取り出して判定する（行が短い場合は空欄扱い）。
+    """
+    block = rows[first:last]
+    if len(block) < last - first:
+        raise IndexError("実績シートの行数が確認する範囲より少ないです")
+    if all(len(row) > col for row in block):
+        cells = map(itemgetter(col), block)
+    else:
+        cells = (row[col] if len(row) > col else "" for row in block)
+    return not all(map(str.strip, cells))
+
 
 class SpreadsheetCheckerCog(commands.Cog):
-    def __init__(self, bot, config):
+    def __init__(self, bot, config, sheet_cache, outbox):
         self.bot = bot
         self.config = config
+        self.sheets = sheet_cache
+        self.outbox = outbox
         self.tz = pytz.timezone("Asia/Tokyo")
-        self.check_daily.start()
+        # ギルドごとのチェック時刻（config の jisseki_check_times、既定は16:30）
+        self.schedule = DailySchedule(self.tz)
+        self._wake = asyncio.Event()
+        self._task = None
+        self._query_failed = set()
+
+    async def cog_load(self):
+        # config.json が読み直されたらチェック時刻を組み直す
+        self.config.add_listener(self.reload_schedule)
+        self._task = asyncio.create_task(self.schedule_loop())
 
     def cog_unload(self):
-        self.check_daily.cancel()
+        self.config.remove_listener(self.reload_schedule)
+        if self._task:
+            self._task.cancel()
+
+    def check_times(self):
+        return {
+            guild_id: parse_times(cfg.get("jisseki_check_times", DEFAULT_CHECK_TIMES))
+            for guild_id, cfg in self.config.items()
+            if cfg.get("jisseki_url")
+        }
 
-    @tasks.loop(minutes=1)
-    async def check_daily(self):
-        now = datetime.now(self.tz)
-        if now.hour == 16 and now.minute == 30:
-            await self.send_notification()
+    def reload_schedule(self):
+        # 設定が変わった時に呼ぶ。眠っているループを起こして次の予定を計算し直させる
+        self.schedule.load(self.check_times(), datetime.now(self.tz))
+        self._wake.set()
 
-    @check_daily.before_loop
-    async def before_check_daily(self):
+    async def schedule_loop(self):
+        """
+        次のチェック時刻まで眠り、時刻が来たギルドをまとめて並行にチェックする。
+        """
         await self.bot.wait_until_ready()
+        self.schedule.load(self.check_times(), datetime.now(self.tz))
+        while True:
+            due_guilds = self.schedule.pop_due(datetime.now(self.tz))
+            if due_guilds:
+                guilds = [self.bot.get_guild(int(guild_id)) for guild_id in due_guilds]
+                with REGISTRY.timer("loop_duration_seconds", cog="spreadsheet_checker", loop="jisseki_schedule"):
+                    await asyncio.gather(*(self.check_guild(guild) for guild in guilds if guild is not None))
+
+            next_due = self.schedule.next_due()
+            timeout = max(0.0, (next_due - datetime.now(self.tz)).total_seconds()) if next_due else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
 
     async def send_notification(self):
-        for guild in self.bot.guilds:
-            config = self.config.get(str(guild.id))
-            if not config:
-                continue
+        # 時刻に関係なく、全ギルドを今すぐチェックする
+        await asyncio.gather(*(self.check_guild(guild) for guild in self.bot.guilds))
 
-            try:
-                jisseki_url = config["jisseki_url"]
-                response = requests.get(jisseki_url)
-                response.raise_for_status()
-
-                content = response.content.decode("utf-8")
-                reader = csv.reader(StringIO(content))
-                rows = list(reader)
-
-                today = str(datetime.now(self.tz).day)
-                date_row = rows[3]  # 4行目（日付行）
-
-                for col_index, date in enumerate(date_row):
-                    if date.strip() == today:
-                        col_values = [
-                            rows[row_index][col_index] if col_index < len(rows[row_index]) else ""
-                            for row_index in range(6, 18)
-                        ]
-                        if any(cell.strip() == "" for cell in col_values):
-                            channel = discord.utils.get(guild.text_channels, name=config["jisseki_alert_ch_name"])
-                            role = discord.utils.get(guild.roles, name=config["role_name"])
-                            if channel:
-                                messages = [
-                                    f"{role.mention if role else '@here'} 本日の実績報告がまだ入力されてないです！",
-                                    f"{role.mention if role else '@here'} 実績報告の入力忘れてるかも...？ ",
-                                    f"{role.mention if role else '@here'} 実績報告まだみたいです〜！お願いします！",
-                                    f"{role.mention if role else '@here'} 今日の実績入力、16:30過ぎましたよ〜！",
-                                    f"{role.mention if role else '@here'} 本日の報告お忘れなく！入力チェックしてます！"
-                                ]
-                                await channel.send(random.choice(messages))
-                            return
-            except Exception as e:
-                print(f"通知処理でエラーが発生しました: {e}")
+    async def export_today_column(self, guild, config, today):
+        """
+        シート全体を取得して、今日の列に空欄があるかを返す（今日の列が無ければ False）。
+        """
+        with REGISTRY.timer("sheet_get_seconds", cog="spreadsheet_checker", guild=guild.id):
+            rows = await self.sheets.get_rows(config["jisseki_url"], cog="spreadsheet_checker", guild=guild.id)
+        REGISTRY.inc("rows_parsed_total", len(rows), cog="spreadsheet_checker", guild=guild.id)
+
+        date_row = rows[config.get("jisseki_date_row", DEFAULT_DATE_ROW) - 1]
+        first, last = config.get("jisseki_check_rows", DEFAULT_CHECK_ROWS)
+        for col_index, date in enumerate(date_row):
+            if date.strip() == today:
+                return column_has_blank(rows, col_index, first - 1, last)
+        return False
+
+    async def query_today_column(self, guild, config, today):
+        """
+        範囲指定のCSVエクスポートで日付行と今日の列の入力欄だけを取得して判定する。失敗した場合は None（全件取得に戻す）。
+        """
+        url = config["jisseki_url"]
+        date_row_number = config.get("jisseki_date_row", DEFAULT_DATE_ROW)
+        first, last = config.get("jisseki_check_rows", DEFAULT_CHECK_ROWS)
+        try:
+            with REGISTRY.timer("sheet_get_seconds", cog="spreadsheet_checker", guild=guild.id):
+                date_rows = await self.sheets.get_rows(range_url(url, f"{date_row_number}:{date_row_number}"),
+                                                       cog="spreadsheet_checker", guild=guild.id)
+                date_row = date_rows[-1]
+                col_index = next((i for i, date in enumerate(date_row) if date.strip() == today), None)
+                if col_index is None:
+                    return False
+                letter = column_letter(col_index)
+                rows = await self.sheets.get_rows(range_url(url, f"{letter}{first}:{letter}{last}"),
+                                                  cog="spreadsheet_checker", guild=guild.id)
+        except Exception as e:
+            if guild.id not in self._query_failed:
+                print(f"⚠️ 実績シートの絞り込み取得に失敗したため全件取得で確認します（{guild.name}）: {e}")
+                self._query_failed.add(guild.id)
+            return None
+        self._query_failed.discard(guild.id)
+        REGISTRY.inc("rows_parsed_total", len(date_rows) + len(rows), cog="spreadsheet_checker", guild=guild.id)
+        # 範囲の末尾の空欄は行ごと返ってこないので、足りない行は空欄として扱う
+        expected = last - first + 1
+        return len(rows) < expected or not all(row[0].strip() if row else "" for row in rows[:expected])
+
+    async def check_guild(self, guild):
+        config = self.config.get(str(guild.id))
+        if not config:
+            return
+
+        try:
+            today = str(datetime.now(self.tz).day)
+            if config.get("sheet_fetch_mode") == FETCH_MODE_QUERY:
+                has_blank = await self.query_today_column(guild, config, today)
+            else:
+                has_blank = None
+            if has_blank is None:
+                has_blank = await self.export_today_column(guild, config, today)
+
+            if has_blank:
+                channel = config.text_channel(guild, "jisseki_alert_ch_name")
+                if channel:
+                    mention = config.role_mention(guild)
+                    messages = [
+                        f"{mention} 本日の実績報告がまだ入力されてないです！",
+                        f"{mention} 実績報告の入力忘れてるかも...？ ",
+                        f"{mention} 実績報告まだみたいです〜！お願いします！",
+                        f"{mention} 今日の実績入力、チェックの時間過ぎましたよ〜！",
+                        f"{mention} 本日の報告お忘れなく！入力チェックしてます！"
+                    ]
+                    self.outbox.send(channel, random.choice(messages), cog="spreadsheet_checker", guild=guild.id)
+        except Exception as e:
+            print(f"通知処理でエラーが発生しました: {e}")
@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import discord
+from aiohttp import web
+from discord import app_commands
+from discord.ext import commands, tasks
+
+from atomic_file import write_text_atomic
+from metrics import REGISTRY
+
+LAG_INTERVAL = 1.0  # 秒。この間隔で眠り、起きるのが遅れた分をイベントループの遅延とする
+METRICS_FILE = os.getenv("METRICS_FILE")  # 指定するとPrometheus形式のテキストを定期的に書き出す
+METRICS_PORT = os.getenv("METRICS_PORT")  # 指定すると http://METRICS_HOST:METRICS_PORT/metrics で公開する
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_FILE_INTERVAL = 15  # 秒
+
+
+def _fmt(summary, unit="秒"):
+    return (f"中央値 {summary.quantile(0.5):.3f}{unit} / p95 {summary.quantile(0.95):.3f}{unit} / "
+            f"最大 {summary.max:.3f}{unit}（{summary.count}回）")
+
+
+class StatsCog(commands.Cog):
+    """
+    計測値（metrics.REGISTRY）の表示と書き出し。
+    """
+
+    def __init__(self, bot, registry=REGISTRY):
+        self.bot = bot
+        self.registry = registry
+        self._lag_task = None
+        self._runner = None
+
+    async def cog_load(self):
+        self._lag_task = asyncio.create_task(self.watch_loop_lag())
+        if METRICS_PORT:
+            app = web.Application()
+            app.router.add_get("/metrics", self.handle_metrics)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, METRICS_HOST, int(METRICS_PORT)).start()
+            print(f"📈 メトリクスを公開しました: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        if METRICS_FILE:
+            self.write_metrics_file.start()
+
+    async def cog_unload(self):
+        if self._lag_task:
+            self._lag_task.cancel()
+        self.write_metrics_file.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def watch_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag = loop.time() - started - LAG_INTERVAL
+            self.registry.observe("event_loop_lag_seconds", max(0.0, lag))
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render_prometheus(), content_type="text/plain")
+
+    @tasks.loop(seconds=METRICS_FILE_INTERVAL)
+    async def write_metrics_file(self):
+        text = self.registry.render_prometheus()
+        try:
+            write_text_atomic(METRICS_FILE, text)
+        except OSError as e:
+            print(f"⚠️ メトリクスの書き出しに失敗しました: {e}")
+
+    @app_commands.command(name="stats", description="Botの処理時間・送信・遅延の統計を表示します（管理者のみ）")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.guild_only()
+    async def stats(self, interaction: discord.Interaction):
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("⚠️ このコマンドは管理者のみ使えます。", ephemeral=True)
+            return
+
+        registry = self.registry
+        guild_id = interaction.guild_id
+        embed = discord.Embed(title="📈 Botの統計", color=0x5865F2)
+
+        loops = [f"`{labels['cog']}.{labels['loop']}` {_fmt(summary)}"
+                 for labels, summary in sorted(registry.find("loop_duration_seconds"), key=lambda x: (x[0]["cog"], x[0]["loop"]))]
+        embed.add_field(name="ループ1回の所要時間", value="\n".join(loops) or "記録なし", inline=False)
+
+        guild_lines = []
+        for name, label in (("guild_check_seconds", "フォーム確認"), ("sheet_get_seconds", "シート取得"),
+                            ("discord_send_seconds", "Discord送信")):
+            for labels, summary in sorted(registry.find(name, guild=guild_id), key=lambda x: x[0]["cog"]):
+                guild_lines.append(f"{label}（{labels['cog']}） {_fmt(summary)}")
+        rows = registry.total("rows_parsed_total", guild=guild_id)
+        guild_lines.append(f"解析した行数 {rows}行")
+        guild_mb = registry.total("sheet_fetch_bytes_total", guild=guild_id) / 1024 / 1024
+        guild_lines.append(f"シートの受信量 {guild_mb:.1f}MB")
+        guild_lines.append(f"429（レート制限） {registry.total('discord_rate_limited_total', guild=guild_id)}回")
+        unchanged = registry.total("form_polls_total", guild=guild_id, result="unchanged")
+        changed = registry.total("form_polls_total", guild=guild_id, result="changed")
+        guild_lines.append(f"フォームの確認 変化あり{changed}回 / 変化なし{unchanged}回")
+        misses = registry.total("route_lookups_total", guild=guild_id, result="miss")
+        hits = registry.total("route_lookups_total", guild=guild_id, result="hit")
+        guild_lines.append(f"送信先の索引 ヒット{hits}回 / 索引に無く全走査{misses}回")
+        embed.add_field(name="このサーバー", value="\n".join(guild_lines), inline=False)
+
+        fetches = [f"HTTP {labels['status']} {_fmt(summary)}"
+                   for labels, summary in sorted(registry.find("sheet_fetch_seconds"), key=lambda x: x[0]["status"])]
+        fetched_mb = registry.total("sheet_fetch_bytes_total") / 1024 / 1024
+        fetches.append(f"受信量 {fetched_mb:.1f}MB")
+        embed.add_field(name="シート取得（全体）", value="\n".join(fetches), inline=False)
+
+        other = [f"429（レート制限） {registry.total('discord_rate_limited_total')}回"]
+        for _, summary in registry.find("reminder_lag_seconds", guild=guild_id):
+            other.append(f"リマインドの遅れ {_fmt(summary)}")
+        for _, summary in registry.find("event_loop_lag_seconds"):
+            other.append(f"イベントループの遅延 {_fmt(summary)}")
+        embed.add_field(name="遅延・レート制限", value="\n".join(other), inline=False)
+
+        outbox = [f"送信待ち {registry.gauge('outbox_depth')}通"]
+        for labels, summary in sorted(registry.find("outbox_wait_seconds"), key=lambda x: x[0]["cog"]):
+            outbox.append(f"積んでから届くまで（{labels['cog']}） {_fmt(summary)}")
+        outbox.append(f"まとめて送った数 {registry.total('outbox_coalesced_total')}通 / "
+                      f"再送 {registry.total('outbox_retries_total')}回 / 送信失敗 {registry.total('outbox_dropped_total')}通")
+        embed.add_field(name="送信キュー", value="\n".join(outbox), inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+from datetime import datetime
+
+import discord
+import pytest
+import pytz
+
+from fake_discord import FakeBot, FakeGuild, Recorder
+from guild_config import GuildConfigStore
+from outbox import Outbox
+from sheets_server import FormLayout, form_rows, person_name, to_csv
+
+TZ = pytz.timezone("Asia/Tokyo")
+WORK_CHANNEL_NAME = "今日のお仕事"
+LAYOUT = FormLayout()
+
+
+class Response:
+    status = 403
+    reason = "Forbidden"
+
+
+class FailingRecorder(Recorder):
+    # fail に入っている送信先IDへの送信は 403 で失敗させる
+    def __init__(self):
+        super().__init__()
+        self.fail = set()
+
+    async def send(self, destination, content=None, **kwargs):
+        if destination.id in self.fail:
+            raise discord.HTTPException(Response(), "Forbidden")
+        await super().send(destination, content, **kwargs)
+
+
+class Sheets:
+    """
+    SheetCache の代わり。URLごとの回答行を持ち、get() でCSVを返す。
+    """
+
+    def __init__(self):
+        self.rows = {}
+
+    async def get(self, url, max_age=None, **labels):
+        body = to_csv([LAYOUT.columns] + self.rows[url])
+        return type("Sheet", (), {"body": body, "digest": hashlib.sha256(body).hexdigest()})()
+
+
+class World:
+    def __init__(self, guild_count, people):
+        self.recorder = FailingRecorder()
+        self.sheets = Sheets()
+        self.guilds = []
+        values = {}
+        for g in range(guild_count):
+            guild = FakeGuild(1000 + g, self.recorder)
+            values[str(guild.id)] = {
+                "SNS_LINK": "https://example.com",
+                "syuttaikinn_url": f"form{g}",
+                "check_from_form_time": "2000/01/01 00:00:00",
+            }
+            self.sheets.rows[f"form{g}"] = []
+            self.guilds.append(guild)
+        self.people = people
+        self.config = GuildConfigStore(path=None, values=values)
+        self.outbox = Outbox(bucket_size=100, bucket_period=0.01)
+
+    def add_destination(self, guild, name):
+        category = guild.add_category(name)
+        return guild.add_text_channel(WORK_CHANNEL_NAME, category)
+
+    def answer(self, g, count, start_minute=0, group=0):
+        today = datetime.now(TZ).date()
+        self.sheets.rows[f"form{g}"] += form_rows(count, self.people, today, LAYOUT, start_minute=start_minute, group=group)
+
+    def new_cog(self):
+        from form_watcher import FormWatcherCog
+
+        cog = FormWatcherCog(FakeBot(self.guilds), self.config, self.sheets, self.outbox)
+        cog.cog_unload()
+        for guild in self.guilds:
+            cog.routes.build(guild)
+        return cog
+
+    async def poll(self, cog):
+        for guild in self.guilds:
+            await cog.check_guild_form(guild)
+        await self.outbox.join()
+        # 届いた/届かなかったの結果（done callback）を反映させる
+        await asyncio.sleep(0)
+
+    def embeds_to(self, destination):
+        return [embed for _, dest_id, _, embeds in self.recorder.sends if dest_id == destination.id for embed in embeds]
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    # 通知済みログ・ウォーターマークなどはカレントディレクトリに書かれる
+    monkeypatch.chdir(tmp_path)
+
+
+def test_same_name_in_two_guilds_is_notified_in_both():
+    world = World(guild_count=2, people=1)
+    dests = [world.add_destination(guild, person_name(0)) for guild in world.guilds]
+    world.answer(0, 1)
+    world.answer(1, 1)
+
+    async def main():
+        await world.poll(world.new_cog())
+
+    asyncio.run(main())
+    assert [len(world.embeds_to(dest)) for dest in dests] == [1, 1]
+
+
+def test_new_rows_only_after_watermark():
+    world = World(guild_count=1, people=3)
+    dests = [world.add_destination(world.guilds[0], person_name(i)) for i in range(3)]
+    world.answer(0, 3)
+
+    async def main():
+        cog = world.new_cog()
+        await world.poll(cog)
+        await world.poll(cog)  # 変化なし
+        first = [len(world.embeds_to(dest)) for dest in dests]
+        world.answer(0, 3, start_minute=600)  # 同じ3人の出勤がもう一度届く
+        await world.poll(cog)
+        return first, cog.watermarks.get(world.guilds[0].id)["row"]
+
+    first, row = asyncio.run(main())
+    assert first == [1, 1, 1]
+    assert [len(world.embeds_to(dest)) for dest in dests] == [1, 1, 1]  # 同じ人・同じ出退勤は送らない
+    assert row == 6
+
+
+def test_row_without_destination_is_retried_after_restart():
+    world = World(guild_count=1, people=2)
+    guild = world.guilds[0]
+    dest0 = world.add_destination(guild, person_name(0))
+    world.answer(0, 2)
+
+    async def main():
+        cog = world.new_cog()
+        await world.poll(cog)
+        mark = cog.watermarks.get(guild.id)
+        # 再起動後、送信先ができてから確認する（シートは変わっていない）
+        dest1 = world.add_destination(guild, person_name(1))
+        restarted = world.new_cog()
+        await world.poll(restarted)
+        return mark, dest1, restarted.watermarks.get(guild.id)
+
+    mark, dest1, after = asyncio.run(main())
+    assert (mark["row"], mark["retry"]) == (2, [2])
+    assert len(world.embeds_to(dest0)) == 1
+    assert len(world.embeds_to(dest1)) == 1
+    assert after["retry"] == []
+
+
+def test_failed_delivery_is_retried():
+    world = World(guild_count=1, people=1)
+    dest = world.add_destination(world.guilds[0], person_name(0))
+    world.answer(0, 1)
+    world.recorder.fail.add(dest.id)
+
+    async def main():
+        cog = world.new_cog()
+        await world.poll(cog)
+        retry = sorted(cog.retry_rows[world.guilds[0].id])
+        world.recorder.fail.clear()
+        await world.poll(cog)
+        return retry
+
+    assert asyncio.run(main()) == [1]
+    assert len(world.embeds_to(dest)) == 1
@@ -0,0 +1,61 @@
+from form_watermark import WatermarkStore, iter_form_rows
+
+HEADER = ["タイムスタンプ", "お名前", "出退勤"]
+
+
+def csv_body(rows, preamble=()):
+    lines = [",".join(row) for row in [*preamble, HEADER, *rows]]
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def rows(count):
+    return [[f"2026/10/18 09:{i:02d}:00", f"利用者{i}", "出勤"] for i in range(count)]
+
+
+def read(body, mark=None, retry=()):
+    it = iter_form_rows(body, mark, retry=retry)
+    header_index, headers, start = next(it)
+    return header_index, headers, start, [row_number for row_number, _ in it]
+
+
+def mark_after(store, body, row):
+    header_index, headers, _, _ = read(body)
+    store.update(1, header_index, headers, row, f"2026/10/18 09:{row - 1:02d}:00")
+    return store.get(1)
+
+
+def test_first_read_returns_every_row(tmp_path):
+    assert read(csv_body(rows(3))) == (0, HEADER, 0, [1, 2, 3])
+
+
+def test_watermark_skips_processed_rows(tmp_path):
+    store = WatermarkStore(str(tmp_path / "mark.json"))
+    mark = mark_after(store, csv_body(rows(3)), 3)
+    assert read(csv_body(rows(5)), mark)[2:] == (3, [4, 5])
+
+
+def test_retry_rows_come_back_before_new_rows(tmp_path):
+    store = WatermarkStore(str(tmp_path / "mark.json"))
+    mark = mark_after(store, csv_body(rows(3)), 3)
+    assert read(csv_body(rows(5)), mark, retry={2})[2:] == (3, [2, 4, 5])
+
+
+def test_changed_rows_before_watermark_force_full_scan(tmp_path):
+    store = WatermarkStore(str(tmp_path / "mark.json"))
+    mark = mark_after(store, csv_body(rows(3)), 3)
+    # 先頭の行が削除された → 処理済みの最終行のタイムスタンプが合わない
+    assert read(csv_body(rows(5)[1:]), mark, retry={2})[2:] == (0, [1, 2, 3, 4])
+
+
+def test_moved_header_forces_full_scan(tmp_path):
+    store = WatermarkStore(str(tmp_path / "mark.json"))
+    mark = mark_after(store, csv_body(rows(3)), 3)
+    assert read(csv_body(rows(3), preamble=[["説明"]]), mark) == (1, HEADER, 0, [1, 2, 3])
+
+
+def test_store_round_trip_keeps_retry(tmp_path):
+    path = str(tmp_path / "mark.json")
+    store = WatermarkStore(path)
+    store.update(1, 0, HEADER, 5, "2026/10/18 09:04:00", retry={4, 2})
+    store.save()
+    assert WatermarkStore(path).get(1)["retry"] == [2, 4]
@@ -0,0 +1,125 @@
+import asyncio
+
+import discord
+import pytest
+
+import outbox as outbox_module
+from metrics import MetricsRegistry
+from outbox import Outbox
+
+
+class Response:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "error"
+
+
+class Destination:
+    def __init__(self, destination_id, fail=()):
+        self.id = destination_id
+        self.name = f"dest{destination_id}"
+        self.sent = []
+        self.fail = list(fail)  # 先頭から順に、送信時に返すHTTPステータス
+
+    async def send(self, content=None, **kwargs):
+        if self.fail:
+            raise discord.HTTPException(Response(self.fail.pop(0)), "error")
+        self.sent.append((content, kwargs.get("embeds", [])))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def new_outbox():
+    return Outbox(bucket_size=5, bucket_period=0.05, registry=MetricsRegistry())
+
+
+def test_queued_messages_are_merged_in_order():
+    async def main():
+        box = new_outbox()
+        dest = Destination(1)
+        futures = [box.send(dest, f"通知{i}") for i in range(3)]
+        assert await asyncio.gather(*futures) == [True, True, True]
+        return dest.sent
+
+    assert run(main()) == [("通知0\n通知1\n通知2", [])]
+
+
+def test_destinations_are_independent():
+    async def main():
+        box = new_outbox()
+        a, b = Destination(1), Destination(2)
+        box.send(a, "a1")
+        box.send(b, "b1")
+        box.send(a, "a2")
+        await box.join()
+        return a.sent, b.sent
+
+    assert run(main()) == ([("a1\na2", [])], [("b1", [])])
+
+
+def test_merge_respects_embed_limit_and_silent():
+    async def main():
+        box = new_outbox()
+        dest = Destination(1)
+        for i in range(12):
+            box.send(dest, embed=discord.Embed(title=str(i)))
+        box.send(dest, "静か", silent=True)
+        await box.join()
+        return dest.sent
+
+    sent = run(main())
+    assert [len(embeds) for _, embeds in sent] == [10, 2, 0]
+    assert [embed.title for _, embeds in sent for embed in embeds] == [str(i) for i in range(12)]
+    assert sent[-1][0] == "静か"
+
+
+def test_later_messages_wait_for_earlier_ones():
+    async def main():
+        box = new_outbox()
+        dest = Destination(1)
+        first = box.send(dest, "1通目")
+        await asyncio.sleep(0)  # 1通目の送信が始まってから積む
+        second = box.send(dest, "2通目")
+        await asyncio.gather(first, second)
+        return dest.sent
+
+    assert [content for content, _ in run(main())] == ["1通目", "2通目"]
+
+
+def test_server_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(outbox_module, "RETRY_BASE", 0)
+
+    async def main():
+        box = new_outbox()
+        dest = Destination(1, fail=[500, 429])
+        delivered = await box.send(dest, "再送")
+        return delivered, dest.sent, box.registry.total("outbox_retries_total")
+
+    assert run(main()) == (True, [("再送", [])], 2)
+
+
+@pytest.mark.parametrize("status", [403, 404])
+def test_client_errors_are_dropped(status):
+    async def main():
+        box = new_outbox()
+        dest = Destination(1, fail=[status])
+        delivered = await box.send(dest, "届かない")
+        return delivered, dest.sent, box.registry.total("outbox_dropped_total")
+
+    assert run(main()) == (False, [], 1)
+
+
+def test_close_resolves_pending_messages_as_failed():
+    async def main():
+        box = Outbox(bucket_size=1, bucket_period=60, registry=MetricsRegistry())
+        dest = Destination(1)
+        first = box.send(dest, "1通目")
+        await asyncio.sleep(0)
+        second = box.send(dest, "2通目")
+        await first
+        await box.close()
+        return second.result(), box.depth
+
+    assert run(main()) == (False, 0)
@@ -0,0 +1,71 @@
+import json
+
+from reminder_store import STORE_VERSION, ReminderStore
+
+
+def reminder(date="20261018", time="09:00", user_id=1, repeat=None):
+    return {"date": date, "time": time, "user_id": user_id, "message": "テスト", "repeat": repeat}
+
+
+def test_flush_and_reload(tmp_path):
+    path = str(tmp_path / "remind.json")
+    store = ReminderStore(path)
+    first = store.add("1", reminder(time="10:00"))
+    second = store.add("1", reminder(time="09:00"))
+    store.flush()
+    reloaded = ReminderStore(path)
+    assert [item["id"] for item in reloaded.list("1")] == [second, first]
+    assert reloaded.add("1", reminder()) == second + 1
+
+
+def test_flush_keeps_previous_generation(tmp_path):
+    path = tmp_path / "remind.json"
+    store = ReminderStore(str(path))
+    store.add("1", reminder())
+    store.flush()
+    store.add("1", reminder())
+    store.flush()
+    assert len(json.loads((tmp_path / "remind.json.bak").read_text(encoding="utf-8"))["reminders"]["1"]) == 1
+
+
+def test_recovers_from_tmp_when_main_file_is_broken(tmp_path):
+    path = tmp_path / "remind.json"
+    store = ReminderStore(str(path))
+    store.add("1", reminder())
+    store.flush()
+    (tmp_path / "remind.json.tmp").write_text(path.read_text(encoding="utf-8"), encoding="utf-8")
+    path.write_text('{"version": 2, "remin', encoding="utf-8")
+    recovered = ReminderStore(str(path))
+    assert len(recovered.list("1")) == 1
+    assert recovered._dirty  # 復旧した内容は次の書き込みで本体に戻す
+
+
+def test_recovers_from_backup(tmp_path):
+    path = tmp_path / "remind.json"
+    store = ReminderStore(str(path))
+    store.add("1", reminder())
+    store.flush()
+    store.add("1", reminder())
+    store.flush()
+    path.write_text("", encoding="utf-8")
+    assert len(ReminderStore(str(path)).list("1")) == 1
+
+
+def test_migrates_old_format(tmp_path):
+    path = tmp_path / "remind.json"
+    path.write_text(json.dumps({"1": [reminder(), reminder(time="08:00")]}), encoding="utf-8")
+    store = ReminderStore(str(path))
+    assert [item["time"] for item in store.list("1")] == ["08:00", "09:00"]
+    store.flush()
+    assert json.loads(path.read_text(encoding="utf-8"))["version"] == STORE_VERSION
+
+
+def test_remove_and_reschedule_update_indexes(tmp_path):
+    store = ReminderStore(str(tmp_path / "remind.json"))
+    a = store.add("1", reminder(time="09:00"))
+    b = store.add("1", reminder(time="10:00", user_id=2))
+    store.reschedule("1", store.get("1", a), "20261019", "09:00")
+    assert [item["id"] for item in store.list("1")] == [b, a]
+    assert store.remove("1", b)["id"] == b
+    assert store.get("1", b) is None
+    assert store.list_by_owner("1", 2) == []
@@ -0,0 +1,72 @@
+import json
+
+from sent_store import SentEntryStore
+
+TODAY = "2026/10/18"
+YESTERDAY = "2026/10/17"
+
+
+def new_store(tmp_path, legacy=None):
+    store = SentEntryStore(str(tmp_path / "sent.jsonl"), legacy_path=str(tmp_path / "sent_entries.json"))
+    if legacy is not None:
+        (tmp_path / "sent_entries.json").write_text(json.dumps(legacy), encoding="utf-8")
+    store.load(TODAY)
+    return store
+
+
+def test_keys_are_per_guild(tmp_path):
+    store = new_store(tmp_path)
+    store.add(TODAY, 1, "利用者|出勤")
+    assert (TODAY, 1, "利用者|出勤") in store
+    assert (TODAY, 2, "利用者|出勤") not in store
+
+
+def test_reload_reads_todays_journal(tmp_path):
+    store = new_store(tmp_path)
+    store.add(YESTERDAY, 1, "前日|出勤")
+    store.add(TODAY, 1, "利用者|出勤")
+    reloaded = new_store(tmp_path)
+    assert reloaded.keys == {(1, "利用者|出勤")}
+
+
+def test_late_add_for_previous_day_keeps_today(tmp_path):
+    store = new_store(tmp_path)
+    store.add(TODAY, 1, "利用者|出勤")
+    # 0時をまたいで届いた前日分の送信結果
+    store.add(YESTERDAY, 1, "前日|退勤")
+    assert store.date == TODAY
+    assert (TODAY, 1, "利用者|出勤") in store
+    assert (YESTERDAY, 1, "前日|退勤") in store
+    store.add(TODAY, 1, "別の人|出勤")
+    assert (TODAY, 1, "利用者|出勤") in store
+
+
+def test_rolls_forward_to_the_next_day(tmp_path):
+    store = new_store(tmp_path)
+    store.add(TODAY, 1, "利用者|出勤")
+    assert ("2026/10/19", 1, "利用者|出勤") not in store
+    assert store.date == "2026/10/19"
+
+
+def test_legacy_keys_suppress_every_guild(tmp_path):
+    store = new_store(tmp_path, legacy=["利用者|出勤"])
+    assert (TODAY, 1, "利用者|出勤") in store
+    assert (TODAY, 2, "利用者|出勤") in store
+    assert not (tmp_path / "sent_entries.json").exists()
+    assert (tmp_path / "sent_entries.json.migrated").exists()
+
+
+def test_compact_drops_old_dates(tmp_path):
+    store = new_store(tmp_path)
+    store.add("2026/10/01", 1, "古い|出勤")
+    store.add(TODAY, 1, "利用者|出勤")
+    assert store.compact(TODAY) == 1
+    assert new_store(tmp_path).keys == {(1, "利用者|出勤")}
+
+
+def test_torn_last_line_is_repaired(tmp_path):
+    path = tmp_path / "sent.jsonl"
+    path.write_text('{"date": "2026/10/18", "guild": 1, "key": "a"}\n{"date": "2026/10', encoding="utf-8")
+    store = new_store(tmp_path)
+    store.add(TODAY, 1, "b")
+    assert new_store(tmp_path).keys == {(1, "a"), (1, "b")}